@@ -0,0 +1,131 @@
+"""
+Compares cache codecs on payloads shaped like the ones the API caches: a single film,
+a page of film search results and a genre list.
+
+Reports encode/decode time and encoded size for each codec and, given a Redis URL,
+the memory Redis reports for a key holding the encoded value. Codecs whose package
+isn't installed are skipped, `poetry install -E codecs` installs them all.
+
+    PYTHONPATH=src python benchmarks/cache_codecs.py [--redis redis://127.0.0.1:6379/0]
+"""
+import argparse
+import asyncio
+import random
+import string
+import timeit
+import uuid
+from dataclasses import asdict
+
+import aioredis
+
+from db.codecs import CacheCodec, make_codec
+from db.elastic import CacheEntry, ElasticSearchResult
+
+CODECS = [
+    ("orjson", None),
+    ("orjson", "zstd"),
+    ("orjson", "lz4"),
+    ("msgpack", None),
+    ("msgpack", "zstd"),
+    ("msgpack", "lz4"),
+]
+
+
+def words(n: int) -> str:
+    return " ".join(
+        "".join(random.choices(string.ascii_lowercase, k=random.randint(3, 10)))
+        for _ in range(n)
+    )
+
+
+def person() -> dict:
+    return {"id": str(uuid.uuid4()), "name": words(2).title()}
+
+
+def film() -> dict:
+    genres = [{"id": str(uuid.uuid4()), "name": words(1)} for _ in range(3)]
+    actors = [person() for _ in range(15)]
+    writers = [person() for _ in range(3)]
+    directors = [person() for _ in range(2)]
+    return {
+        "id": str(uuid.uuid4()),
+        "title": words(4).title(),
+        "description": words(60),
+        "imdb_rating": round(random.uniform(1, 10), 1),
+        "genres": genres,
+        "actors": actors,
+        "writers": writers,
+        "directors": directors,
+        "genres_names": [x["name"] for x in genres],
+        "actors_names": [x["name"] for x in actors],
+        "writers_names": [x["name"] for x in writers],
+        "directors_names": [x["name"] for x in directors],
+    }
+
+
+def search_result(docs: list[dict]) -> dict:
+    hits = [{"_index": "movies", "_id": x["id"], "_source": x} for x in docs]
+    return asdict(ElasticSearchResult(num_hits=10_000, hits=hits, docs=docs))
+
+
+PAYLOADS = {
+    "film": CacheEntry(film()).dump(),
+    "films page (50)": CacheEntry(search_result([film() for _ in range(50)])).dump(),
+    "genres list": CacheEntry(
+        search_result([{"id": str(uuid.uuid4()), "name": words(1)} for _ in range(30)])
+    ).dump(),
+}
+
+
+async def redis_memory(redis: aioredis.Redis, value: bytes) -> int:
+    key = f"benchmark:{uuid.uuid4()}"
+    await redis.set(key, value)
+    try:
+        return await redis.memory_usage(key)
+    finally:
+        await redis.delete(key)
+
+
+def available_codecs() -> list[tuple[str, CacheCodec]]:
+    codecs = []
+    for serializer, compressor in CODECS:
+        try:
+            codec = make_codec(serializer, compressor, compress_threshold=1024)
+        except RuntimeError as e:
+            print(f"skipping {serializer}+{compressor}: {e}")
+            continue
+        codecs.append((f"{serializer}+{compressor}", codec))
+    return codecs
+
+
+async def main(redis_url: str | None, number: int) -> None:
+    codecs = available_codecs()
+    redis = aioredis.from_url(redis_url) if redis_url else None
+    print(
+        f"{'payload':<16}{'codec':<16}{'bytes':>9}{'encode us':>11}{'decode us':>11}"
+        + (f"{'redis bytes':>13}" if redis else "")
+    )
+    for payload_name, payload in PAYLOADS.items():
+        for codec_name, codec in codecs:
+            encoded = codec.encode(payload)
+            encode = timeit.timeit(lambda: codec.encode(payload), number=number)
+            decode = timeit.timeit(lambda: codec.decode(encoded), number=number)
+            line = (
+                f"{payload_name:<16}{codec_name:<16}"
+                f"{len(encoded):>9}{encode / number * 1e6:>11.1f}"
+                f"{decode / number * 1e6:>11.1f}"
+            )
+            if redis:
+                line += f"{await redis_memory(redis, encoded):>13}"
+            print(line)
+    if redis:
+        await redis.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--redis", help="Redis URL to measure memory usage against")
+    parser.add_argument("--number", type=int, default=1000)
+    args = parser.parse_args()
+    random.seed(0)
+    asyncio.run(main(args.redis, args.number))
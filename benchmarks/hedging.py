@@ -0,0 +1,117 @@
+"""
+Compares the latency of Elasticsearch reads with and without hedging against a
+local stub of a cluster with two copies of each shard, one of which pauses now and
+then, as a node does on garbage collection.
+
+The stub sends a read to the copy picked by its `preference`, or to either one
+without a preference, so a hedge has an even chance of going to the healthy copy.
+
+    PYTHONPATH=src python benchmarks/hedging.py [--queries 2000] [--pause-rate 0.05]
+"""
+import argparse
+import asyncio
+import random
+import time
+import zlib
+
+from aiohttp import web
+from elasticsearch import AsyncElasticsearch
+
+from db.elastic import ElasticAdapter, ElasticAdapterProtocol, ElasticIndexes
+from db.hedging import HedgingElasticAdapter, hedging_stats
+
+PORT = 9299
+# a product check passes with this answer to GET /
+INFO = {"version": {"number": "8.2.2", "build_flavor": "default"}, "tagline": ""}
+HEADERS = {"X-Elastic-Product": "Elasticsearch"}
+
+
+def stub_app(latency: float, pause: float, pause_rate: float) -> web.Application:
+    async def info(request: web.Request) -> web.Response:
+        return web.json_response(INFO, headers=HEADERS)
+
+    async def get(request: web.Request) -> web.Response:
+        if preference := request.query.get("preference"):
+            copy = zlib.crc32(preference.encode()) % 2
+        else:
+            copy = random.randrange(2)
+        delay = latency
+        if copy == 0 and random.random() < pause_rate:
+            delay += pause
+        await asyncio.sleep(delay)
+        doc = {"id": request.match_info["id"], "title": "film"}
+        return web.json_response(
+            {"_id": doc["id"], "found": True, "_source": doc}, headers=HEADERS
+        )
+
+    app = web.Application()
+    app.router.add_get("/", info)
+    app.router.add_get("/{index}/_doc/{id}", get)
+    return app
+
+
+def percentile(latencies: list[float], p: float) -> float:
+    latencies = sorted(latencies)
+    return latencies[min(len(latencies) - 1, int(len(latencies) * p / 100))]
+
+
+async def measure(
+    adapter: ElasticAdapterProtocol, queries: int, concurrency: int
+) -> list[float]:
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def query(i: int) -> None:
+        async with semaphore:
+            started_at = time.monotonic()
+            await adapter.get(ElasticIndexes.MOVIES, i)
+            latencies.append(time.monotonic() - started_at)
+
+    await asyncio.gather(*(query(i) for i in range(queries)))
+    return latencies
+
+
+async def main(args: argparse.Namespace) -> None:
+    runner = web.AppRunner(stub_app(args.latency, args.pause, args.pause_rate))
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", PORT).start()
+    elastic = AsyncElasticsearch(hosts=[f"http://127.0.0.1:{PORT}"], maxsize=100)
+    adapters = {
+        "single shot": ElasticAdapter(elastic),
+        f"hedged p{args.percentile:g}": HedgingElasticAdapter(
+            elastic,
+            percentile=args.percentile,
+            initial_delay=args.latency * 2,
+            min_delay=0.0,
+        ),
+    }
+    try:
+        print(f"{'adapter':<16}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+        for name, adapter in adapters.items():
+            latencies = await measure(adapter, args.queries, args.concurrency)
+            print(
+                f"{name:<16}"
+                + "".join(
+                    f"{percentile(latencies, p) * 1000:>9.1f}" for p in (50, 95, 99)
+                )
+                + f"{max(latencies) * 1000:>9.1f}"
+            )
+        print(
+            f"hedged {hedging_stats.hedged} of {hedging_stats.queries} queries, "
+            f"the hedge answered first {hedging_stats.hedge_wins} times"
+        )
+    finally:
+        await elastic.close()
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.005)
+    parser.add_argument("--pause", type=float, default=0.2)
+    parser.add_argument("--pause-rate", type=float, default=0.05)
+    parser.add_argument("--percentile", type=float, default=95)
+    random.seed(0)
+    asyncio.run(main(parser.parse_args()))
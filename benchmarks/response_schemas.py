@@ -0,0 +1,133 @@
+"""
+Compares the CPU time of building a response from Elasticsearch documents the way
+the routes used to, validating the documents as models, again as schemas and once
+more against the route's response model, with building it the way they do now,
+validating them once, as models.
+
+Measured for a page of 50 films, as the film list responds with it, and for a film
+with a large cast, as the film retrieval responds with it.
+
+    PYTHONPATH=src python benchmarks/response_schemas.py [--number 200]
+"""
+import argparse
+import asyncio
+import random
+import string
+import time
+import uuid
+from typing import Any, Callable
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from api.base import PaginatedResponse, Paginator, sparse_response
+from api.v1.schemas import FilmLongSchema, FilmShortSchema
+from db.elastic import project
+from models.base import projection
+from models.film import Film
+
+SHORT_FIELDS = tuple(sorted(FilmShortSchema.__fields__))
+
+
+def words(n: int) -> str:
+    return " ".join(
+        "".join(random.choices(string.ascii_lowercase, k=random.randint(3, 10)))
+        for _ in range(n)
+    )
+
+
+def person() -> dict:
+    return {"id": str(uuid.uuid4()), "name": words(2).title()}
+
+
+def film(actors: int) -> dict:
+    genres = [{"id": str(uuid.uuid4()), "name": words(1)} for _ in range(3)]
+    actors = [person() for _ in range(actors)]
+    writers = [person() for _ in range(5)]
+    directors = [person() for _ in range(2)]
+    return {
+        "id": str(uuid.uuid4()),
+        "title": words(4).title(),
+        "description": words(60),
+        "imdb_rating": round(random.uniform(1, 10), 1),
+        "genres": genres,
+        "actors": actors,
+        "writers": writers,
+        "directors": directors,
+        "genres_names": [x["name"] for x in genres],
+        "actors_names": [x["name"] for x in actors],
+        "writers_names": [x["name"] for x in writers],
+        "directors_names": [x["name"] for x in directors],
+    }
+
+
+async def validated(content: Any, response_model: Any) -> bytes:
+    """
+    The body FastAPI responds with, validating the content against the response
+    model.
+    """
+    field = create_response_field(name="response", type_=response_model)
+    content = await serialize_response(
+        field=field, response_content=content, is_coroutine=True
+    )
+    return ORJSONResponse(jsonable_encoder(content)).body
+
+
+async def films_page(docs: list[dict], fast: bool) -> bytes:
+    paginator = Paginator(page_number=1, page_size=len(docs))
+    # the list fetches just the fields it responds with, see FilmService.search
+    model = projection(Film, SHORT_FIELDS)
+    films = [model(**doc) for doc in docs]
+    if fast:
+        films = [FilmShortSchema.from_model(x) for x in films]
+        return sparse_response(paginator.page(len(docs), films), None).body
+    films = [FilmShortSchema(**x.dict()) for x in films]
+    return await validated(
+        paginator.page(len(docs), films), PaginatedResponse[FilmShortSchema]
+    )
+
+
+async def film_retrieval(doc: dict, fast: bool) -> bytes:
+    film = Film(**doc)
+    if fast:
+        return sparse_response(FilmLongSchema.from_model(film), None).body
+    return await validated(FilmLongSchema(**film.dict()), FilmLongSchema)
+
+
+async def measure(build: Callable, payload: Any, fast: bool, number: int) -> float:
+    started_at = time.process_time()
+    for _ in range(number):
+        await build(payload, fast)
+    return (time.process_time() - started_at) / number
+
+
+BENCHMARKS: list[tuple[str, Callable, Any]] = [
+    (
+        "films page (50)",
+        films_page,
+        [project(film(actors=15), SHORT_FIELDS) for _ in range(50)],
+    ),
+    ("film, 500 actors", film_retrieval, film(actors=500)),
+]
+
+
+async def main(number: int) -> None:
+    print(f"{'response':<18}{'validated us':>14}{'once us':>10}{'saved':>8}")
+    for name, build, payload in BENCHMARKS:
+        assert await build(payload, True) == await build(payload, False)
+        slow = await measure(build, payload, False, number)
+        fast = await measure(build, payload, True, number)
+        print(
+            f"{name:<18}{slow * 1e6:>14.0f}{fast * 1e6:>10.0f}"
+            f"{1 - fast / slow:>8.0%}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number", type=int, default=200)
+    args = parser.parse_args()
+    random.seed(0)
+    asyncio.run(main(args.number))
@@ -0,0 +1,90 @@
+import secrets
+from dataclasses import asdict
+from http import HTTPStatus
+
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException
+
+from core.config import config
+from db import cache, elastic, hedging, pools
+from db.elastic import ElasticIndexes
+from db.generations import IndexGenerations, get_generations
+from services.warmup import warm_up_cache
+
+
+async def authorize(authorization: str | None = Header(None)) -> None:
+    """
+    Let through the requests bearing `ADMIN_TOKEN`, hiding the admin API entirely
+    when no token is configured.
+    """
+    if not config.ADMIN_TOKEN:
+        raise HTTPException(status_code=HTTPStatus.NOT_FOUND)
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not secrets.compare_digest(
+        token.encode(), config.ADMIN_TOKEN.encode()
+    ):
+        raise HTTPException(
+            status_code=HTTPStatus.UNAUTHORIZED,
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+
+router = APIRouter(dependencies=[Depends(authorize)])
+
+
+@router.get("/cache/stats", summary="Cache Statistics")
+async def cache_stats() -> dict:
+    """
+    Get hit/miss counters per cache tier and the size of the local cache.
+
+    The counters are kept per worker process, so consecutive requests may be
+    answered by different workers.
+    """
+    stats = {tier: asdict(tier_stats) for tier, tier_stats in cache.cache_stats.items()}
+    if cache.local_cache is not None:
+        stats["local"]["entries"] = len(cache.local_cache)
+        stats["local"]["bytes"] = cache.local_cache.bytes
+    return stats
+
+
+@router.get("/pools/stats", summary="Connection Pool Statistics")
+async def pool_stats() -> dict:
+    """
+    Get connection counters and the time spent getting a connection per client,
+    and how many connections of its pools are in use, and open for Redis.
+
+    Like the cache statistics, these are kept per worker process.
+    """
+    stats = {
+        client: asdict(client_stats)
+        for client, client_stats in pools.pool_stats.items()
+    }
+    stats["redis"]["pool"] = pools.redis_pool_usage(cache.redis_client)
+    stats["elastic"]["pools"] = pools.elastic_pool_usage(elastic.elastic_client)
+    return stats
+
+
+@router.get("/hedging/stats", summary="Hedged Query Statistics")
+async def hedged_query_stats() -> dict:
+    """
+    Get how many Elasticsearch queries were hedged and how many of the hedges were
+    answered first, kept per worker process like the other statistics.
+    """
+    return asdict(hedging.hedging_stats)
+
+
+@router.post("/cache/generations/{index}", summary="Invalidate Index Cache")
+async def invalidate_index(
+    index: ElasticIndexes,
+    background_tasks: BackgroundTasks,
+    generations: IndexGenerations = Depends(get_generations),
+) -> dict:
+    """
+    Invalidate everything cached from an index, e.g. after the ETL reindexes it, by
+    bumping the index's generation, then warm the cache up again.
+
+    Workers pick the new generation up within `CACHE_GENERATION_EXPIRE` seconds.
+    """
+    generation = await generations.bump(index)
+    if config.CACHE_WARMUP_ENABLED:
+        background_tasks.add_task(warm_up_cache)
+    return {"index": index, "generation": generation}
@@ -1,9 +1,21 @@
-from dataclasses import dataclass
-from typing import Generic, TypeVar
+import base64
+import binascii
+from dataclasses import asdict, dataclass
+from http import HTTPStatus
+from typing import Any, Callable, Generic, NoReturn, Type, TypeVar
+from uuid import UUID
 
-from fastapi import Query
+import orjson
+from fastapi import HTTPException, Query
+from fastapi.responses import ORJSONResponse, Response
+from pydantic import BaseModel
 from pydantic.generics import GenericModel
 
+from core.config import config
+from core.context import request_context
+from models.base import projection
+from services.base import Cursor
+
 ResponseModel = TypeVar("ResponseModel")
 
 
@@ -27,3 +39,168 @@ class Paginator:
 
     def _pages_count(self, num_hits: int, page_size: int) -> int:
         return num_hits // page_size + (1 if num_hits % page_size else 0)
+
+
+class BulkResponse(GenericModel, Generic[ResponseModel]):
+    # an item per requested id in the requested order, None for the ones not found
+    results: list[ResponseModel | None]
+
+
+def bulk_ids(
+    ids: str
+    | None = Query(
+        default=None,
+        description=(
+            "Comma separated ids to get the items of, in that order, instead of "
+            f"listing them, up to {config.BULK_MAX_IDS}."
+        ),
+    )
+) -> list[UUID] | None:
+    """
+    Dependency reading the ids of a bulk retrieval, None when they aren't given.
+    """
+    if ids is None:
+        return None
+    try:
+        parsed = [UUID(x.strip()) for x in ids.split(",") if x.strip()]
+    except ValueError:
+        invalid_query("ids", "invalid id")
+    if not parsed:
+        invalid_query("ids", "no ids given")
+    if len(parsed) > config.BULK_MAX_IDS:
+        invalid_query("ids", f"more than {config.BULK_MAX_IDS} ids given")
+    return parsed
+
+
+def timeout(seconds: float | None) -> Callable[[], None]:
+    """
+    Make a dependency setting the timeout of the route's requests instead of the
+    default one.
+    """
+
+    def dependency() -> None:
+        if context := request_context.get():
+            context.set_timeout(seconds)
+
+    return dependency
+
+
+class CursorPaginatedResponse(GenericModel, Generic[ResponseModel]):
+    # pass as `page[cursor]` to get the next page, None on the last page
+    next_cursor: str | None
+    results: list[ResponseModel]
+
+
+@dataclass
+class CursorPaginator:
+    cursor: str | None = Query(
+        default=None,
+        alias="page[cursor]",
+        description="The next cursor of the previous page, none for the first page.",
+    )
+    page_size: int = Query(default=50, ge=1, le=1000, alias="page[size]")
+
+    def position(self) -> Cursor | None:
+        if self.cursor is None:
+            return None
+        try:
+            cursor = Cursor(**orjson.loads(base64.urlsafe_b64decode(self.cursor)))
+        except (binascii.Error, orjson.JSONDecodeError, TypeError):
+            invalid_query("page[cursor]", "invalid cursor")
+        if not isinstance(cursor.search_after, list) or not isinstance(
+            cursor.pit_id, str | None
+        ):
+            invalid_query("page[cursor]", "invalid cursor")
+        return cursor
+
+    def page(self, items: list, cursor: Cursor | None) -> CursorPaginatedResponse:
+        return CursorPaginatedResponse(
+            next_cursor=(
+                base64.urlsafe_b64encode(orjson.dumps(asdict(cursor))).decode()
+                if cursor
+                else None
+            ),
+            results=items,
+        )
+
+
+def fieldset(resource: str, schema: Type[BaseModel]) -> Callable[..., set[str] | None]:
+    """
+    Make a dependency reading the sparse fieldset of `resource` from the
+    `fields[resource]` query parameter: a comma separated list of `schema` fields,
+    None when the parameter isn't given.
+    """
+
+    def dependency(
+        fields: str
+        | None = Query(
+            default=None,
+            alias=f"fields[{resource}]",
+            description=f"Comma separated {resource} fields to respond with.",
+        )
+    ) -> set[str] | None:
+        if fields is None:
+            return None
+        requested = {x.strip() for x in fields.split(",") if x.strip()}
+        if not requested:
+            invalid_query(f"fields[{resource}]", "no fields given")
+        if unknown := requested - schema.__fields__.keys():
+            invalid_query(
+                f"fields[{resource}]", f"unknown fields: {', '.join(sorted(unknown))}"
+            )
+        return requested
+
+    return dependency
+
+
+def invalid_query(name: str, message: str) -> NoReturn:
+    """
+    Reject a query parameter the way FastAPI rejects the ones failing validation.
+    """
+    raise HTTPException(
+        status_code=HTTPStatus.UNPROCESSABLE_ENTITY,
+        detail=[
+            {
+                "loc": ["query", name],
+                "msg": message,
+                "type": "value_error",
+            }
+        ],
+    )
+
+
+def sparse(schema: Type[BaseModel], fields: set[str] | None, **nested: Any) -> Any:
+    """
+    The `include` argument of `schema.dict()` keeping `fields`, or every field if
+    None, and applying the `nested` includes to the items of the nested list
+    fields. None if nothing is left out.
+    """
+    nested = {name: include for name, include in nested.items() if include is not None}
+    if fields is None and not nested:
+        return None
+    return {
+        name: {"__all__": nested[name]} if name in nested else ...
+        for name in schema.__fields__
+        if fields is None or name in fields
+    }
+
+
+def sparse_schema(schema: Type[BaseModel], fields: set[str] | None) -> Type[BaseModel]:
+    """
+    The schema of a resource responded with the given fieldset.
+    """
+    if fields is None:
+        return schema
+    return projection(schema, tuple(sorted(fields)))
+
+
+def sparse_response(content: BaseModel | list[BaseModel], include: Any) -> Response:
+    """
+    Respond with the `include` of the content, or with all of it if None.
+
+    The content is serialized as it is, without FastAPI validating it against the
+    route's response model, since the schemas are built from validated models.
+    """
+    if isinstance(content, list):
+        return ORJSONResponse([x.dict(include=include) for x in content])
+    return ORJSONResponse(content.dict(include=include))
@@ -0,0 +1,203 @@
+import hashlib
+import time
+from http import HTTPStatus
+from typing import Awaitable, Callable
+from uuid import UUID
+
+from fastapi import Depends, Request, Response
+from pydantic import BaseModel
+
+from core.config import config
+from core.context import request_context
+from db.cache import CacheAdapterProtocol, cache_stats, get_cache
+from db.elastic import CacheEntry, CachePolicy, ElasticIndexes
+from db.generations import IndexGenerations, get_generations
+from services.base import cache_keys, cache_policy
+
+# headers set for every response rather than stored with it
+UNCACHED_HEADERS = {"content-length"}
+# headers of a response left out of a Not Modified answer to its request
+UNMODIFIED_HEADERS = {"content-type"}
+# resources of the lists nested in the models, named in surrogate keys
+NESTED_RESOURCES = {
+    "genres": "genre",
+    "actors": "person",
+    "writers": "person",
+    "directors": "person",
+    "actor": "film",
+    "writer": "film",
+    "director": "film",
+}
+
+
+class ResponseCache:
+    """
+    Rendered responses of a request, served as they were encoded, without
+    querying Elasticsearch or building models. Only successful responses are
+    cached, for the policy's TTL spread by its jitter, without a cache they are
+    just tagged. Like cached queries, a response is built again ahead of its
+    expiry, by a request it is missed for with a probability growing as the
+    expiry nears and as the response took longer to build (XFetch). Responses
+    built from expired cache entries aren't cached, nor cacheable downstream, so
+    that they are built again once Elasticsearch answers.
+
+    Successful responses carry a strong ETag, the digest of their body, and are
+    answered with a 304 when the request's `If-None-Match` names it, straight from
+    the cache on a hit. They carry the route's `Cache-Control` and surrogate keys
+    too, cached along with them.
+    """
+
+    def __init__(
+        self,
+        cache: CacheAdapterProtocol | None,
+        key: str,
+        policy: CachePolicy,
+        cache_control: str,
+        if_none_match: str | None = None,
+    ):
+        self.cache = cache
+        self.key = key
+        self.policy = policy
+        self.cache_control = cache_control
+        self.if_none_match = if_none_match
+
+    async def get(self) -> Response | None:
+        if self.cache is None:
+            return None
+        if (entry := await self.cache.get(self.key)) is not None:
+            entry = CacheEntry.load(entry)
+        if entry is not None and (
+            entry.is_expired
+            or self.policy.should_refresh(entry.delta, entry.expires_at)
+        ):
+            entry = None
+        cache_stats["responses"].record(entry is not None)
+        if entry is None:
+            return None
+        headers = entry.value["headers"]
+        if self._not_modified(headers["etag"]):
+            return self._unmodified(headers)
+        return Response(entry.value["body"].encode(), headers=headers)
+
+    async def set(
+        self, response: Response, surrogate_keys: list[str] | None = None
+    ) -> Response:
+        if response.status_code != HTTPStatus.OK:
+            return response
+        stale = (context := request_context.get()) is not None and context.stale
+        response.headers["etag"] = etag(response.body)
+        response.headers["cache-control"] = (
+            config.STALE_CACHE_CONTROL if stale else self.cache_control
+        )
+        if surrogate_keys:
+            response.headers[config.SURROGATE_KEY_HEADER] = " ".join(surrogate_keys)
+        headers = {
+            name: value
+            for name, value in response.headers.items()
+            if name not in UNCACHED_HEADERS
+        }
+        if self.cache is not None and not stale:
+            ttl = self.policy.expire()
+            entry = CacheEntry(
+                {"body": response.body.decode(), "headers": headers},
+                time.monotonic() - context.started_at if context else 0.0,
+                time.time() + ttl,
+            )
+            await self.cache.set(self.key, entry.dump(), ttl)
+        if self._not_modified(headers["etag"]):
+            return self._unmodified(headers)
+        return response
+
+    def _not_modified(self, tag: str) -> bool:
+        """
+        Whether `If-None-Match` names the tag, compared weakly as RFC 9110 has it.
+        """
+        if self.if_none_match is None:
+            return False
+        if self.if_none_match.strip() == "*":
+            return True
+        return any(
+            x.strip().removeprefix("W/") == tag for x in self.if_none_match.split(",")
+        )
+
+    @staticmethod
+    def _unmodified(headers: dict[str, str]) -> Response:
+        return Response(
+            status_code=HTTPStatus.NOT_MODIFIED,
+            headers={
+                name: value
+                for name, value in headers.items()
+                if name not in UNMODIFIED_HEADERS
+            },
+        )
+
+
+def etag(body: bytes) -> str:
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def surrogate_keys(resource: str, *items: BaseModel | UUID) -> list[str]:
+    """
+    Surrogate keys of a response with the given models or ids of `resource`: the
+    resource itself, for purging all of its responses, each of its items and the
+    resources nested in them, e.g. `film film:<id> genre:<id> person:<id>`.
+    """
+    keys = {resource: None}
+    for item in items:
+        if isinstance(item, UUID):
+            keys[f"{resource}:{item}"] = None
+            continue
+        if (id := getattr(item, "id", None)) is not None:
+            keys[f"{resource}:{id}"] = None
+        for name, nested in NESTED_RESOURCES.items():
+            for x in getattr(item, name, None) or []:
+                keys[f"{nested}:{x.id}"] = None
+    return list(keys)
+
+
+def response_cache(
+    *indexes: ElasticIndexes, ttl: int, cache_control: str
+) -> Callable[..., Awaitable[ResponseCache]]:
+    """
+    Make a dependency caching the route's responses per path and query.
+
+    Responses are cached under the generations of the `indexes` the route reads,
+    so invalidating an index invalidates the responses built from it too.
+    """
+    policy = cache_policy(ttl)
+
+    async def dependency(
+        request: Request,
+        cache: CacheAdapterProtocol = Depends(get_cache),
+        generations: IndexGenerations | None = Depends(get_generations),
+    ) -> ResponseCache:
+        if_none_match = request.headers.get("if-none-match")
+        if not config.RESPONSE_CACHE_ENABLED:
+            return ResponseCache(None, "", policy, cache_control, if_none_match)
+        key = cache_keys.build(
+            "responses",
+            request.url.path,
+            sorted(request.query_params.multi_items()),
+            [await generations.get(x) if generations else 0 for x in indexes],
+        )
+        return ResponseCache(cache, key, policy, cache_control, if_none_match)
+
+    return dependency
+
+
+def uncached_response(cache_control: str) -> Callable[..., Awaitable[ResponseCache]]:
+    """
+    Make a dependency for the routes whose responses aren't cached, to tag them
+    like the cached ones.
+    """
+
+    async def dependency(request: Request) -> ResponseCache:
+        return ResponseCache(
+            None,
+            "",
+            CachePolicy(ttl=0),
+            cache_control,
+            request.headers.get("if-none-match"),
+        )
+
+    return dependency
@@ -0,0 +1,44 @@
+from http import HTTPStatus
+from typing import Awaitable, Callable
+
+from fastapi import Request, Response
+from fastapi.responses import ORJSONResponse
+
+from core.config import config
+from core.context import DeadlineExceeded, RequestContext, request_context
+
+STALE_WARNING = '110 - "Response is Stale"'
+# seconds the client is willing to wait for the response
+TIMEOUT_HEADER = "X-Request-Timeout"
+
+
+async def request_context_middleware(
+    request: Request, call_next: Callable[[Request], Awaitable[Response]]
+) -> Response:
+    """
+    Set up the request's context and reflect it in the response headers.
+    """
+    context = RequestContext(client_timeout=_client_timeout(request))
+    context.set_timeout(config.REQUEST_TIMEOUT)
+    request_context.set(context)
+    response = await call_next(request)
+    if context.stale:
+        response.headers["Warning"] = STALE_WARNING
+    return response
+
+
+async def deadline_exceeded_handler(
+    request: Request, exc: DeadlineExceeded
+) -> Response:
+    return ORJSONResponse(
+        status_code=HTTPStatus.GATEWAY_TIMEOUT,
+        content={"detail": "request deadline exceeded"},
+    )
+
+
+def _client_timeout(request: Request) -> float | None:
+    try:
+        timeout = float(request.headers[TIMEOUT_HEADER])
+    except (KeyError, ValueError):
+        return None
+    return timeout if timeout > 0 else None
@@ -1,39 +1,102 @@
-from enum import Enum
 from http import HTTPStatus
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 
-from api.base import PaginatedResponse, Paginator
-from api.v1.schemas import FilmLongSchema, FilmShortSchema
-from services.film import FilmService, get_film_service
+from api.base import (
+    BulkResponse,
+    CursorPaginatedResponse,
+    CursorPaginator,
+    PaginatedResponse,
+    Paginator,
+    bulk_ids,
+    invalid_query,
+    sparse,
+    sparse_response,
+    sparse_schema,
+    timeout,
+)
+from api.cache import ResponseCache, response_cache, surrogate_keys, uncached_response
+from api.v1.schemas import (
+    FilmLongSchema,
+    FilmShortSchema,
+    film_fieldset,
+    film_short_fieldset,
+    genre_fieldset,
+    person_short_fieldset,
+)
+from core.config import config
+from db.elastic import ElasticIndexes
+from db.popularity import Popularity, get_popularity
+from services.base import CursorExpired, InvalidCursor
+from services.film import FilmService, SortFilmsOptions, get_film_service
 
 router = APIRouter()
 
-
-class SortFilmsOptions(str, Enum):
-    RATING_DESC = "-imdb_rating"
-    RATING_ASC = "imdb_rating"
+films_cache = response_cache(
+    ElasticIndexes.MOVIES,
+    ttl=config.FILMS_CACHE_EXPIRE,
+    cache_control=config.FILMS_CACHE_CONTROL,
+)
 
 
 @router.get(
-    "/", response_model=PaginatedResponse[FilmShortSchema], summary="List Films"
+    "/",
+    response_model=PaginatedResponse[FilmShortSchema] | BulkResponse[FilmShortSchema],
+    summary="List Films",
 )
 async def list_films(
     sort: SortFilmsOptions = Query(default=SortFilmsOptions.RATING_DESC),
     genre: UUID | None = Query(default=None, alias="filter[genre]"),
     paginator: Paginator = Depends(Paginator),
+    ids: list[UUID] | None = Depends(bulk_ids),
+    fields: set[str] | None = Depends(film_short_fieldset),
     film_service: FilmService = Depends(get_film_service),
-) -> PaginatedResponse[FilmShortSchema]:
+    cache: ResponseCache = Depends(films_cache),
+) -> PaginatedResponse[FilmShortSchema] | BulkResponse[FilmShortSchema] | Response:
     """
     Get a paginated list of films that sorted by rating and, optionally,
     filtered by genre.
+
+    Given `ids`, get the films with those ids instead, in that order, with null for
+    the ones not found.
     """
+    if response := await cache.get():
+        return response
+    if ids is not None:
+        films = await film_service.retrieve_many(
+            ids, fields=list(fields or FilmShortSchema.__fields__)
+        )
+        schema = sparse_schema(FilmShortSchema, fields)
+        return await cache.set(
+            sparse_response(
+                BulkResponse(
+                    results=[
+                        schema.from_model(film) if film else None for film in films
+                    ]
+                ),
+                sparse(BulkResponse, None, results=sparse(FilmShortSchema, fields)),
+            ),
+            surrogate_keys("film", *ids),
+        )
     films, num_hits = await film_service.search(
-        None, sort, genre, paginator.page_number, paginator.page_size
+        None,
+        sort,
+        genre,
+        paginator.page_number,
+        paginator.page_size,
+        fields=list(fields or FilmShortSchema.__fields__),
+    )
+    keys = surrogate_keys("film", *films)
+    schema = sparse_schema(FilmShortSchema, fields)
+    films = [schema.from_model(film) for film in films]
+    return await cache.set(
+        sparse_response(
+            paginator.page(num_hits, films),
+            sparse(PaginatedResponse, None, results=sparse(FilmShortSchema, fields)),
+        ),
+        keys,
     )
-    films = [FilmShortSchema.from_model(film) for film in films]
-    return paginator.page(num_hits, films)
 
 
 @router.get(
@@ -42,8 +105,10 @@ async def list_films(
 async def search_films(
     query: str,
     paginator: Paginator = Depends(Paginator),
+    fields: set[str] | None = Depends(film_short_fieldset),
     film_service: FilmService = Depends(get_film_service),
-) -> PaginatedResponse[FilmShortSchema]:
+    cache: ResponseCache = Depends(films_cache),
+) -> PaginatedResponse[FilmShortSchema] | Response:
     """
     Get a paginated list of films that match the search query.
 
@@ -54,21 +119,115 @@ async def search_films(
     - writers' names
     - directors' names
     """
+    if response := await cache.get():
+        return response
     films, num_hits = await film_service.search(
-        query, None, None, paginator.page_number, paginator.page_size
+        query,
+        None,
+        None,
+        paginator.page_number,
+        paginator.page_size,
+        fields=list(fields or FilmShortSchema.__fields__),
+    )
+    keys = surrogate_keys("film", *films)
+    schema = sparse_schema(FilmShortSchema, fields)
+    films = [schema.from_model(film) for film in films]
+    return await cache.set(
+        sparse_response(
+            paginator.page(num_hits, films),
+            sparse(PaginatedResponse, None, results=sparse(FilmShortSchema, fields)),
+        ),
+        keys,
+    )
+
+
+@router.get(
+    "/scroll",
+    response_model=CursorPaginatedResponse[FilmShortSchema],
+    summary="Scroll Films",
+    dependencies=[Depends(timeout(config.SCROLL_REQUEST_TIMEOUT))],
+)
+async def scroll_films(
+    sort: SortFilmsOptions = Query(default=SortFilmsOptions.RATING_DESC),
+    genre: UUID | None = Query(default=None, alias="filter[genre]"),
+    paginator: CursorPaginator = Depends(CursorPaginator),
+    fields: set[str] | None = Depends(film_short_fieldset),
+    film_service: FilmService = Depends(get_film_service),
+    cache: ResponseCache = Depends(uncached_response(config.SCROLL_CACHE_CONTROL)),
+) -> CursorPaginatedResponse[FilmShortSchema] | Response:
+    """
+    Page through every film, sorted and filtered like the film list, with a cursor.
+
+    Pages cost the same at any depth and, as long as each page is requested soon
+    after the previous one, show the films as they were when the first page was
+    read. Keep the sort and filter of the first page for the following ones. A
+    cursor left unused for too long expires, answered with a 410.
+    """
+    try:
+        films, cursor = await film_service.scroll(
+            sort,
+            genre,
+            paginator.position(),
+            paginator.page_size,
+            fields=list(fields or FilmShortSchema.__fields__),
+        )
+    except InvalidCursor:
+        invalid_query("page[cursor]", "invalid cursor")
+    except CursorExpired:
+        raise HTTPException(
+            status_code=HTTPStatus.GONE,
+            detail="cursor expired, start again from the first page",
+        )
+    keys = surrogate_keys("film", *films)
+    schema = sparse_schema(FilmShortSchema, fields)
+    films = [schema.from_model(film) for film in films]
+    return await cache.set(
+        sparse_response(
+            paginator.page(films, cursor),
+            sparse(
+                CursorPaginatedResponse, None, results=sparse(FilmShortSchema, fields)
+            ),
+        ),
+        keys,
     )
-    films = [FilmShortSchema.from_model(film) for film in films]
-    return paginator.page(num_hits, films)
 
 
 @router.get("/{film_id}", response_model=FilmLongSchema, summary="Retrieve Film")
 async def retrieve_film(
-    film_id: UUID, film_service: FilmService = Depends(get_film_service)
-) -> FilmLongSchema:
+    film_id: UUID,
+    fields: set[str] | None = Depends(film_fieldset),
+    genre_fields: set[str] | None = Depends(genre_fieldset),
+    person_fields: set[str] | None = Depends(person_short_fieldset),
+    film_service: FilmService = Depends(get_film_service),
+    popularity: Popularity | None = Depends(get_popularity),
+    cache: ResponseCache = Depends(films_cache),
+) -> FilmLongSchema | Response:
     """
     Retrieve a film by id.
+
+    `fields[film]` limits the film's fields, `fields[genre]` and `fields[person]`
+    the fields of its genres and persons.
     """
-    film = await film_service.retrieve(film_id)
-    if not film:
-        raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="film not found")
-    return FilmLongSchema.from_model(film)
+    if not (response := await cache.get()):
+        film = await film_service.retrieve(film_id, list(fields) if fields else None)
+        if not film:
+            raise HTTPException(
+                status_code=HTTPStatus.NOT_FOUND, detail="film not found"
+            )
+        response = await cache.set(
+            sparse_response(
+                sparse_schema(FilmLongSchema, fields).from_model(film),
+                sparse(
+                    FilmLongSchema,
+                    fields,
+                    genres=genre_fields,
+                    actors=person_fields,
+                    writers=person_fields,
+                    directors=person_fields,
+                ),
+            ),
+            surrogate_keys("film", film_id, film),
+        )
+    if popularity:
+        popularity.record(ElasticIndexes.MOVIES, film_id)
+    return response
@@ -1,31 +1,81 @@
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 
-from api.v1.schemas import GenreSchema
+from api.base import BulkResponse, bulk_ids, sparse, sparse_response
+from api.cache import ResponseCache, response_cache, surrogate_keys
+from api.v1.schemas import GenreSchema, genre_fieldset
+from core.config import config
+from db.elastic import ElasticIndexes
 from services.genre import GenreService, get_genre_service
 
 router = APIRouter()
 
+genres_cache = response_cache(
+    ElasticIndexes.GENRES,
+    ttl=config.GENRES_CACHE_EXPIRE,
+    cache_control=config.GENRES_CACHE_CONTROL,
+)
 
-@router.get("/", response_model=list[GenreSchema], summary="List Genres")
+
+@router.get(
+    "/",
+    response_model=list[GenreSchema] | BulkResponse[GenreSchema],
+    summary="List Genres",
+)
 async def list_genres(
+    ids: list[UUID] | None = Depends(bulk_ids),
+    fields: set[str] | None = Depends(genre_fieldset),
     genre_service: GenreService = Depends(get_genre_service),
-) -> list[GenreSchema]:
+    cache: ResponseCache = Depends(genres_cache),
+) -> list[GenreSchema] | BulkResponse[GenreSchema] | Response:
     """
     Get a list of genres.
+
+    Given `ids`, get the genres with those ids instead, in that order, with null for
+    the ones not found.
     """
+    if response := await cache.get():
+        return response
+    if ids is not None:
+        genres = await genre_service.retrieve_many(ids)
+        return await cache.set(
+            sparse_response(
+                BulkResponse(
+                    results=[
+                        GenreSchema.from_model(genre) if genre else None
+                        for genre in genres
+                    ]
+                ),
+                sparse(BulkResponse, None, results=sparse(GenreSchema, fields)),
+            ),
+            surrogate_keys("genre", *ids),
+        )
     genres = await genre_service.list()
-    return [GenreSchema.from_model(genre) for genre in genres]
+    return await cache.set(
+        sparse_response(
+            [GenreSchema.from_model(genre) for genre in genres],
+            sparse(GenreSchema, fields),
+        ),
+        surrogate_keys("genre", *genres),
+    )
 
 
 @router.get("/{genre_id}", response_model=GenreSchema, summary="Retrieve Genre")
 async def retrieve_genre(
-    genre_id: UUID, genre_service: GenreService = Depends(get_genre_service)
-) -> GenreSchema | None:
+    genre_id: UUID,
+    fields: set[str] | None = Depends(genre_fieldset),
+    genre_service: GenreService = Depends(get_genre_service),
+    cache: ResponseCache = Depends(genres_cache),
+) -> GenreSchema | Response:
     """
     Retrieve a genre by id.
     """
+    if response := await cache.get():
+        return response
     if genre := await genre_service.retrieve(genre_id):
-        return GenreSchema.from_model(genre)
+        return await cache.set(
+            sparse_response(GenreSchema.from_model(genre), sparse(GenreSchema, fields)),
+            surrogate_keys("genre", genre),
+        )
     raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
@@ -1,13 +1,73 @@
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 
-from api.base import PaginatedResponse, Paginator
-from api.v1.schemas import PersonSchema, PersonsFilmsSchema
-from services.person import PersonService, get_person_service
+from api.base import (
+    BulkResponse,
+    PaginatedResponse,
+    Paginator,
+    bulk_ids,
+    invalid_query,
+    sparse,
+    sparse_response,
+)
+from api.cache import ResponseCache, response_cache, surrogate_keys
+from api.v1.schemas import (
+    FilmShortSchema,
+    PersonSchema,
+    PersonsFilmsSchema,
+    film_short_fieldset,
+    person_fieldset,
+)
+from core.config import config
+from db.elastic import ElasticIndexes
+from services.person import PersonService, PersonsFilmsSource, get_person_service
 
 router = APIRouter()
 
+persons_cache = response_cache(
+    ElasticIndexes.PERSONS,
+    ttl=config.PERSONS_CACHE_EXPIRE,
+    cache_control=config.PERSONS_CACHE_CONTROL,
+)
+# filmographies are built from films looked up in the movies index too
+persons_films_cache = response_cache(
+    ElasticIndexes.PERSONS,
+    ElasticIndexes.MOVIES,
+    ttl=min(config.PERSONS_CACHE_EXPIRE, config.FILMS_CACHE_EXPIRE),
+    cache_control=config.PERSONS_FILMS_CACHE_CONTROL,
+)
+
+
+@router.get("/", response_model=BulkResponse[PersonSchema], summary="Retrieve Persons")
+async def retrieve_persons(
+    ids: list[UUID] | None = Depends(bulk_ids),
+    fields: set[str] | None = Depends(person_fieldset),
+    person_service: PersonService = Depends(get_person_service),
+    cache: ResponseCache = Depends(persons_cache),
+) -> BulkResponse[PersonSchema] | Response:
+    """
+    Retrieve the persons with the given ids, in that order, with null for the ones
+    not found.
+    """
+    if ids is None:
+        invalid_query("ids", "no ids given")
+    if response := await cache.get():
+        return response
+    persons = await person_service.retrieve_many(ids, fields and list(fields))
+    return await cache.set(
+        sparse_response(
+            BulkResponse(
+                results=[
+                    PersonSchema.from_model(person) if person else None
+                    for person in persons
+                ]
+            ),
+            sparse(BulkResponse, None, results=sparse(PersonSchema, fields)),
+        ),
+        surrogate_keys("person", *ids),
+    )
+
 
 @router.get(
     "/search", response_model=PaginatedResponse[PersonSchema], summary="Search Persons"
@@ -15,30 +75,54 @@ router = APIRouter()
 async def search_persons(
     query: str,
     paginator: Paginator = Depends(Paginator),
+    fields: set[str] | None = Depends(person_fieldset),
     person_service: PersonService = Depends(get_person_service),
-) -> PaginatedResponse[PersonSchema]:
+    cache: ResponseCache = Depends(persons_cache),
+) -> PaginatedResponse[PersonSchema] | Response:
     """
     Get a paginated list of persons that match the search query.
 
     The search is conducted only on the full name attribute.
     """
+    if response := await cache.get():
+        return response
     persons, num_hits = await person_service.search(
-        query, paginator.page_number, paginator.page_size
+        query,
+        paginator.page_number,
+        paginator.page_size,
+        fields=fields and list(fields),
     )
+    # persons are named by their ids alone, their films are ids in the response
+    keys = surrogate_keys("person", *(person.id for person in persons))
     persons = [PersonSchema.from_model(person) for person in persons]
-    return paginator.page(num_hits, persons)
+    return await cache.set(
+        sparse_response(
+            paginator.page(num_hits, persons),
+            sparse(PaginatedResponse, None, results=sparse(PersonSchema, fields)),
+        ),
+        keys,
+    )
 
 
 @router.get("/{person_id}", response_model=PersonSchema, summary="Retrieve Person")
 async def retrieve_person(
     person_id: UUID,
+    fields: set[str] | None = Depends(person_fieldset),
     person_service: PersonService = Depends(get_person_service),
-) -> PersonSchema:
+    cache: ResponseCache = Depends(persons_cache),
+) -> PersonSchema | Response:
     """
     Retrieve a person by id.
     """
-    if person := await person_service.retrieve(person_id):
-        return PersonSchema.from_model(person)
+    if response := await cache.get():
+        return response
+    if person := await person_service.retrieve(person_id, fields and list(fields)):
+        return await cache.set(
+            sparse_response(
+                PersonSchema.from_model(person), sparse(PersonSchema, fields)
+            ),
+            surrogate_keys("person", person_id),
+        )
     raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
 
 
@@ -49,11 +133,28 @@ async def retrieve_person(
 )
 async def list_persons_films(
     person_id: UUID,
+    source: PersonsFilmsSource | None = None,
+    fields: set[str] | None = Depends(film_short_fieldset),
     person_service: PersonService = Depends(get_person_service),
-) -> PersonsFilmsSchema:
+    cache: ResponseCache = Depends(persons_films_cache),
+) -> PersonsFilmsSchema | Response:
     """
     List films a person is associated with.
+
+    By default films are taken from the person's document where it has all their
+    fields, `source=movies` takes them from the films themselves.
     """
-    if persons_films := await person_service.list_movies(person_id):
-        return PersonsFilmsSchema.from_model(persons_films)
+    if response := await cache.get():
+        return response
+    if persons_films := await person_service.list_movies(person_id, source):
+        films = sparse(FilmShortSchema, fields)
+        return await cache.set(
+            sparse_response(
+                PersonsFilmsSchema.from_model(persons_films),
+                sparse(
+                    PersonsFilmsSchema, None, actor=films, writer=films, director=films
+                ),
+            ),
+            surrogate_keys("person", person_id, persons_films),
+        )
     raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
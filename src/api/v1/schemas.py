@@ -1,10 +1,14 @@
+from functools import lru_cache
 from typing import Type, TypeVar
 from uuid import UUID
 
 from pydantic import BaseModel
+from pydantic.fields import SHAPE_LIST
+from pydantic.utils import lenient_issubclass
 
+from api.base import fieldset
 from models.base import BaseDBModel
-from models.person import Person
+from models.person import ROLES
 
 BaseSchemaType = TypeVar("BaseSchemaType", bound="BaseSchema")
 
@@ -12,7 +16,35 @@ BaseSchemaType = TypeVar("BaseSchemaType", bound="BaseSchema")
 class BaseSchema(BaseModel):
     @classmethod
     def from_model(cls: Type[BaseSchemaType], model: BaseDBModel) -> BaseSchemaType:
-        return cls(**model.dict())
+        """
+        Build the schema without validating the model's values again, they are
+        validated once, when the model is read from Elasticsearch.
+        """
+        return cls.construct(
+            **{
+                name: (
+                    [nested.from_model(x) for x in getattr(model, name)]
+                    if nested
+                    else getattr(model, name)
+                )
+                for name, nested in _nested_schemas(cls).items()
+            }
+        )
+
+
+@lru_cache()
+def _nested_schemas(schema: Type[BaseSchema]) -> dict[str, Type[BaseSchema] | None]:
+    """
+    The fields of `schema`, with the schema of their items for lists of schemas.
+    """
+    return {
+        name: (
+            field.type_
+            if field.shape == SHAPE_LIST and lenient_issubclass(field.type_, BaseSchema)
+            else None
+        )
+        for name, field in schema.__fields__.items()
+    }
 
 
 class GenreSchema(BaseSchema):
@@ -33,13 +65,21 @@ class PersonSchema(BaseSchema):
     director: list[UUID]
 
     @classmethod
-    def from_model(cls, person: Person) -> "PersonSchema":
-        return cls(
-            id=person.id,
-            name=person.name,
-            actor=[x.id for x in person.actor],
-            writer=[x.id for x in person.writer],
-            director=[x.id for x in person.director],
+    def from_model(cls, person: BaseDBModel) -> "PersonSchema":
+        """
+        Build the schema from a person, or from a projection of one with the fields
+        it has, its films named by their ids.
+        """
+        return cls.construct(
+            **{
+                name: (
+                    [x.id for x in getattr(person, name)]
+                    if name in ROLES
+                    else getattr(person, name)
+                )
+                for name in cls.__fields__
+                if name in person.__fields__
+            }
         )
 
 
@@ -66,3 +106,11 @@ class PersonsFilmsSchema(BaseSchema):
     actor: list[FilmShortSchema]
     writer: list[FilmShortSchema]
     director: list[FilmShortSchema]
+
+
+# sparse fieldset dependencies of the resources as the routes respond with them
+film_fieldset = fieldset("film", FilmLongSchema)
+film_short_fieldset = fieldset("film", FilmShortSchema)
+genre_fieldset = fieldset("genre", GenreSchema)
+person_fieldset = fieldset("person", PersonSchema)
+person_short_fieldset = fieldset("person", PersonShortSchema)
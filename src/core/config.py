@@ -1,6 +1,7 @@
 import multiprocessing
 from enum import Enum
 from logging import config as logging_config
+from typing import Literal
 
 from pydantic import BaseSettings
 
@@ -34,9 +35,143 @@ class ProdConfig(BaseSettings):
     REDIS_PATH: str = "redis://redis:6379/0"
     ELASTIC_PATH: str = "http://elasticsearch:9200"
 
+    # seconds a request has to be answered in, unless its route sets its own, capped
+    # by the client's X-Request-Timeout header; requests running out of time are
+    # answered with a 504
+    REQUEST_TIMEOUT: float | None = 5.0
+    SCROLL_REQUEST_TIMEOUT: float | None = 30.0
+    # cache lookups are skipped when less than this many seconds are left
+    CACHE_MIN_BUDGET: float = 0.005
+
+    # connection pools of a worker, connections beyond the pool size wait for a free
+    # one, for up to the pool timeout for Redis
+    REDIS_POOL_SIZE: int = 50
+    REDIS_POOL_TIMEOUT: float = 5.0
+    REDIS_CONNECT_TIMEOUT: float = 2.0
+    REDIS_SOCKET_TIMEOUT: float = 5.0
+    REDIS_SOCKET_KEEPALIVE: bool = True
+    REDIS_RETRY_ON_TIMEOUT: bool = True
+    # seconds a connection may be idle before it is checked before use
+    REDIS_HEALTH_CHECK_INTERVAL: int = 30
+    ELASTIC_POOL_SIZE: int = 25
+    # seconds an idle connection is kept open
+    ELASTIC_KEEPALIVE: float = 30.0
+    ELASTIC_TIMEOUT: float = 10.0
+    ELASTIC_MAX_RETRIES: int = 3
+    ELASTIC_RETRY_ON_TIMEOUT: bool = False
+    ELASTIC_HTTP_COMPRESS: bool = False
+    # connections opened on startup
+    REDIS_POOL_WARMUP: int = 10
+    ELASTIC_POOL_WARMUP: int = 10
+
+    # coalesce the concurrent searches and gets of a worker into _msearch and _mget
+    # requests, each query waiting at most the max latency for others to join it
+    ELASTIC_BATCHING_ENABLED: bool = False
+    ELASTIC_BATCH_MAX_SIZE: int = 50
+    ELASTIC_BATCH_MAX_LATENCY: float = 0.002
+
+    # send a duplicate of a read not answered within this percentile of the recent
+    # latencies of its kind to other shard copies, can't be combined with batching
+    ELASTIC_HEDGING_ENABLED: bool = False
+    ELASTIC_HEDGE_PERCENTILE: float = 95.0
+    # hedge delay until enough latencies are known, and the shortest one
+    ELASTIC_HEDGE_INITIAL_DELAY: float = 0.05
+    ELASTIC_HEDGE_MIN_DELAY: float = 0.005
+
     FILMS_CACHE_EXPIRE: int = 60 * 5
     GENRES_CACHE_EXPIRE: int = 60 * 5
     PERSONS_CACHE_EXPIRE: int = 60 * 5
+    # Cache-Control of the responses of the routes reading an index, for CDNs and
+    # clients, which may serve them stale while refreshing them and while the API
+    # fails
+    FILMS_CACHE_CONTROL: str = (
+        "public, max-age=60, stale-while-revalidate=60, stale-if-error=86400"
+    )
+    GENRES_CACHE_CONTROL: str = (
+        "public, max-age=300, stale-while-revalidate=300, stale-if-error=86400"
+    )
+    PERSONS_CACHE_CONTROL: str = (
+        "public, max-age=60, stale-while-revalidate=60, stale-if-error=86400"
+    )
+    # person filmographies read the movies index too
+    PERSONS_FILMS_CACHE_CONTROL: str = (
+        "public, max-age=60, stale-while-revalidate=60, stale-if-error=86400"
+    )
+    # responses served in part from expired cache entries, kept from CDNs and
+    # clients so that they come back for fresh ones
+    STALE_CACHE_CONTROL: str = "no-store"
+    # scrolled pages belong to a point in time opened for a client
+    SCROLL_CACHE_CONTROL: str = "private, no-cache"
+    # header naming the films, genres and persons a response contains, for a CDN
+    # to purge the responses of a resource by, e.g. Cache-Tag for Cloudflare
+    SURROGATE_KEY_HEADER: str = "Surrogate-Key"
+    CACHE_KEY_PREFIX: str = "api"
+    # build a person's films from the films embedded in the person document,
+    # looking up only the incomplete ones in the movies index, or from the movies
+    # index alone
+    PERSONS_FILMS_SOURCE: Literal["person", "movies"] = "person"
+    # most ids a bulk retrieval, e.g. `/films/?ids=...`, may ask for
+    BULK_MAX_IDS: int = 100
+    # cursor paginated pages are read from a point in time kept open this long
+    # between pages, None reads every page from the live index
+    SCROLL_PIT_KEEP_ALIVE: str | None = "1m"
+    # most points in time a worker opens a minute, keeping clients from exhausting
+    # the search contexts of Elasticsearch, first pages past it read the live index
+    SCROLL_MAX_PITS_PER_MINUTE: int = 60
+    # bump a version when its model changes to stop reading keys cached before
+    FILMS_CACHE_VERSION: int = 1
+    GENRES_CACHE_VERSION: int = 1
+    PERSONS_CACHE_VERSION: int = 1
+    # rendered responses of the routes reading an index, cached for as long as the
+    # index's documents, bump the version when a response schema changes
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSES_CACHE_VERSION: int = 3
+    # how long a worker uses an index generation before reading it again
+    CACHE_GENERATION_EXPIRE: float = 1.0
+    # not found documents and empty search results
+    CACHE_NEGATIVE_EXPIRE: int = 30
+    # fraction of the TTL added at random to each key's expiry
+    CACHE_EXPIRE_JITTER: float = 0.1
+    # a worker filling a missing key holds a lock on it, the others wait for the fill
+    CACHE_LOCK_EXPIRE: float = 5.0
+    CACHE_LOCK_WAIT: float = 1.0
+    CACHE_LOCK_POLL_INTERVAL: float = 0.05
+    # how eagerly entries are refreshed in the background ahead of their expiry,
+    # values above 1 favour earlier refreshes, 0 disables them
+    CACHE_EARLY_REFRESH_BETA: float = 1.0
+    # expired entries, other than not found documents and empty results, are kept
+    # this long to be served when Elasticsearch fails or doesn't answer within the
+    # deadline, long enough to ride out a restart without holding every key all day
+    CACHE_STALE_EXPIRE: int = 60 * 5
+    CACHE_STALE_DEADLINE: float = 1.0
+
+    # encoding of cache values, msgpack, zstd and lz4 need their packages installed
+    CACHE_CODEC: Literal["orjson", "msgpack"] = "orjson"
+    CACHE_COMPRESSION: Literal["zstd", "lz4"] | None = None
+    # values smaller than this many bytes are stored uncompressed
+    CACHE_COMPRESSION_THRESHOLD: int = 1024
+
+    # bearer token the admin API requires; without one the admin API answers 404s
+    ADMIN_TOKEN: str | None = None
+
+    # preload hot keys on startup and after an index is invalidated
+    CACHE_WARMUP_ENABLED: bool = True
+    CACHE_WARMUP_CONCURRENCY: int = 4
+    CACHE_WARMUP_TIMEOUT: float = 30.0
+    # pages of the film list warmed up per sort order and genre
+    CACHE_WARMUP_FILMS_PAGES: int = 2
+    CACHE_WARMUP_PAGE_SIZE: int = 50
+    # number of most requested films warmed up
+    CACHE_WARMUP_TOP_FILMS: int = 100
+    # film requests are counted to find the most requested ones
+    POPULARITY_FLUSH_INTERVAL: float = 10.0
+    POPULARITY_MAX_SIZE: int = 10_000
+
+    # in-process cache in front of Redis, one per worker
+    LOCAL_CACHE_ENABLED: bool = True
+    LOCAL_CACHE_MAX_ENTRIES: int = 10_000
+    LOCAL_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    LOCAL_CACHE_EXPIRE: int = 10
 
 
 class DevConfig(ProdConfig):
@@ -51,6 +186,11 @@ class TestConfig(ProdConfig):
     GUNICORN_RELOAD = True
     GUNICORN_WORKERS = 1
 
+    # tests flush Redis between cases, which wouldn't reach the local cache
+    LOCAL_CACHE_ENABLED = False
+    # known to the tests, see tests/functional/config.py
+    ADMIN_TOKEN = "test-admin-token"
+
 
 env_2_config = {
     EnvTypes.DEV: DevConfig,
@@ -0,0 +1,76 @@
+import asyncio
+import time
+from contextvars import ContextVar, copy_context
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Coroutine, TypeVar
+
+T = TypeVar("T")
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+@dataclass
+class RequestContext:
+    """
+    State shared between the layers handling a request, set up by the request
+    context middleware.
+    """
+
+    # part of the response was served from expired cache entries
+    stale: bool = False
+    # monotonic time the request started at and has to be answered by
+    started_at: float = field(default_factory=time.monotonic)
+    deadline: float | None = None
+    # the timeout the client asked for, capping the route's
+    client_timeout: float | None = None
+
+    def set_timeout(self, timeout: float | None) -> None:
+        timeouts = [x for x in (timeout, self.client_timeout) if x is not None]
+        self.deadline = self.started_at + min(timeouts) if timeouts else None
+
+
+request_context: ContextVar[RequestContext | None] = ContextVar(
+    "request_context", default=None
+)
+
+
+def mark_stale() -> None:
+    if context := request_context.get():
+        context.stale = True
+
+
+def remaining() -> float | None:
+    """
+    Seconds left until the request's deadline, None if it has none.
+    """
+    if (context := request_context.get()) is None or context.deadline is None:
+        return None
+    return context.deadline - time.monotonic()
+
+
+async def within_deadline(awaitable: Awaitable[T]) -> T:
+    """
+    Await, cancelling the awaitable and raising `DeadlineExceeded` once the
+    request's deadline passes.
+    """
+    if (timeout := remaining()) is None:
+        return await awaitable
+    try:
+        return await asyncio.wait_for(awaitable, max(timeout, 0))
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded()
+
+
+def detached_task(
+    coro: Coroutine[Any, Any, T], context: RequestContext | None = None
+) -> "asyncio.Task[T]":
+    """
+    Run the coroutine in a task outside of the current request's context, for work
+    shared with or outliving the request, which isn't bound by its deadline nor
+    marks its response stale. The task runs in `context` instead, if given.
+    """
+    task_context = copy_context()
+    task_context.run(request_context.set, context)
+    return task_context.run(asyncio.create_task, coro)
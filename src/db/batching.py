@@ -0,0 +1,150 @@
+import asyncio
+from typing import Any, Awaitable, Callable
+from uuid import UUID
+
+from elasticsearch import AsyncElasticsearch, NotFoundError, TransportError
+from elasticsearch.exceptions import HTTP_EXCEPTIONS
+from elasticsearch_dsl import Search
+
+from core.context import within_deadline
+from db.elastic import (
+    ElasticAdapter,
+    ElasticAdapterProtocol,
+    ElasticSearchResult,
+    search_result,
+)
+
+
+class Batcher:
+    """
+    Collects items submitted concurrently and sends them together with `send`, once
+    `max_size` items are collected or `max_latency` seconds after the first one.
+
+    `send` returns a result per item, an exception instance failing just that item.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[list], Awaitable[list]],
+        max_size: int,
+        max_latency: float,
+    ):
+        self.send = send
+        self.max_size = max_size
+        self.max_latency = max_latency
+        self._pending: list[tuple[Any, asyncio.Future]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._sending: set[asyncio.Task] = set()
+
+    async def submit(self, item: Any) -> Any:
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(
+                self.max_latency, self._flush
+            )
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        task = asyncio.create_task(self._send(batch))
+        self._sending.add(task)
+        task.add_done_callback(self._sending.discard)
+
+    async def _send(self, batch: list[tuple[Any, asyncio.Future]]) -> None:
+        try:
+            results = await self.send([item for item, _ in batch])
+        except Exception as e:
+            results = [e] * len(batch)
+        for (_, future), result in zip(batch, results):
+            # the caller may have been cancelled while the batch was in flight
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+class BatchingElasticAdapter(ElasticAdapterProtocol):
+    """
+    Sends the searches and gets made concurrently by the requests of a worker as
+    `_msearch` and `_mget` requests, trading up to `max_latency` seconds per query
+    for fewer requests to Elasticsearch.
+
+    Searches under a point in time or with request parameters, and `get_many`,
+    which is a batch already, are sent as they are. Callers stop waiting for their
+    batch at their request's deadline, the batch itself isn't bounded by it.
+    """
+
+    def __init__(self, elastic: AsyncElasticsearch, max_size: int, max_latency: float):
+        self.elastic = elastic
+        self.adapter = ElasticAdapter(elastic)
+        self._searches = Batcher(self._msearch, max_size, max_latency)
+        self._gets = Batcher(self._mget, max_size, max_latency)
+
+    async def get(
+        self, index: str, id: UUID, fields: list[str] | None = None
+    ) -> dict | None:
+        return await within_deadline(self._gets.submit((index, id, fields)))
+
+    async def get_many(
+        self, index: str, ids: list[UUID], fields: list[str] | None = None
+    ) -> list[dict | None]:
+        return await self.adapter.get_many(index, ids, fields)
+
+    async def search(self, search: Search) -> ElasticSearchResult:
+        if search._params or "pit" in search._extra:
+            return await self.adapter.search(search)
+        return await within_deadline(self._searches.submit(search))
+
+    async def open_point_in_time(self, index: str, keep_alive: str) -> str:
+        return await self.adapter.open_point_in_time(index, keep_alive)
+
+    async def close_point_in_time(self, pit_id: str) -> None:
+        await self.adapter.close_point_in_time(pit_id)
+
+    async def _msearch(
+        self, searches: list[Search]
+    ) -> list[ElasticSearchResult | Exception]:
+        body = []
+        for search in searches:
+            body += [{"index": search._index}, search.to_dict()]
+        result = await self.elastic.msearch(body=body)
+        return [
+            _error(response) if "error" in response else search_result(response)
+            for response in result["responses"]
+        ]
+
+    async def _mget(
+        self, gets: list[tuple[str, UUID, list[str] | None]]
+    ) -> list[dict | None | Exception]:
+        docs = [
+            {"_index": index, "_id": str(id), "_source": fields or True}
+            for index, id, fields in gets
+        ]
+        result = await self.elastic.mget(body={"docs": docs})
+        return [_doc(doc) for doc in result["docs"]]
+
+
+def _doc(doc: dict) -> dict | None | Exception:
+    if "error" not in doc:
+        return doc["_source"] if doc.get("found") else None
+    error = _error(doc)
+    # a get from a missing index is a not found document, as with `ElasticAdapter`
+    return None if isinstance(error, NotFoundError) else error
+
+
+def _error(response: dict) -> TransportError:
+    error = response["error"]
+    status = response.get("status")
+    if status is None and error.get("type") == "index_not_found_exception":
+        status = 404
+    return HTTP_EXCEPTIONS.get(status, TransportError)(
+        status or "N/A", error.get("type"), error
+    )
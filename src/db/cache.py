@@ -1,35 +1,299 @@
-import json
+import time
+import uuid
 from abc import abstractmethod
-from typing import Any, Protocol
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Iterable, Protocol
 
 from aioredis import Redis
 
+from core.context import remaining, within_deadline
+from db.codecs import CacheCodec, OrjsonSerializer
+
 redis_client: Redis | None = None
+cache_codec = CacheCodec(OrjsonSerializer())
+local_cache: "LocalCache | None" = None
+# seconds of the request's budget below which Redis isn't queried
+min_budget: float = 0.0
+
+# deletes the lock only if it is still held by the caller's token
+UNLOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
 
 
 class CacheAdapterProtocol(Protocol):
     @abstractmethod
-    async def set(self, key: str, value: Any) -> None:
+    async def set(self, key: str, value: Any, ttl: int | None = None) -> None:
         ...
 
     @abstractmethod
     async def get(self, key: str) -> list | dict | None:
         ...
 
+    @abstractmethod
+    async def set_many(self, items: Iterable[tuple[str, Any, int | None]]) -> None:
+        """
+        Set `(key, value, ttl)` items in one round trip.
+        """
+        ...
+
+    @abstractmethod
+    async def get_many(self, keys: list[str]) -> list[Any]:
+        """
+        Get values in the order of `keys`, with None for the ones not cached.
+        """
+        ...
+
+    @abstractmethod
+    async def lock(self, key: str, ttl: float) -> str | None:
+        """
+        Try to acquire a lock that expires after `ttl` seconds, returning a token
+        to release it with or None if the lock is held by someone else.
+        """
+        ...
+
+    @abstractmethod
+    async def unlock(self, key: str, token: str) -> None:
+        ...
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+
+    def record(self, hit: bool) -> None:
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+
+# hit/miss counters of this process per cache tier
+cache_stats: dict[str, CacheStats] = {
+    "local": CacheStats(),
+    "redis": CacheStats(),
+    # rendered responses, looked up in the tiers above
+    "responses": CacheStats(),
+}
+
 
 class RedisAdapter(CacheAdapterProtocol):
-    def __init__(self, redis: Redis):
+    """
+    Commands are bounded by the request's deadline. With less than `min_budget`
+    seconds left, lookups are answered as misses and writes are skipped without
+    querying Redis, leaving the rest of the budget to the query for the value.
+    """
+
+    def __init__(self, redis: Redis, codec: CacheCodec, min_budget: float = 0.0):
         self.redis = redis
+        self.codec = codec
+        self.min_budget = min_budget
 
-    async def set(self, key: str, value: Any) -> None:
-        value = json.dumps(value)
-        await self.redis.set(key, value)
+    async def set(self, key: str, value: Any, ttl: int | None = None) -> int:
+        """
+        Set the value, returning the size of its encoding, 0 if it wasn't set.
+        """
+        if self._out_of_budget():
+            return 0
+        data = self.codec.encode(value)
+        await within_deadline(self.redis.set(key, data, ex=ttl))
+        return len(data)
 
     async def get(self, key: str) -> list | dict | None:
-        if value := await self.redis.get(key):
-            return json.loads(value)
+        if self._out_of_budget():
+            return None
+        value = await within_deadline(self.redis.get(key))
+        cache_stats["redis"].record(value is not None)
+        if value is not None:
+            return self.codec.decode(value)
         return None
 
+    async def set_many(self, items: Iterable[tuple[str, Any, int | None]]) -> list[int]:
+        """
+        Set the items, returning the sizes of their encodings, 0s if they weren't.
+        """
+        items = list(items)
+        if self._out_of_budget():
+            return [0] * len(items)
+        sizes = []
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for key, value, ttl in items:
+                data = self.codec.encode(value)
+                pipe.set(key, data, ex=ttl)
+                sizes.append(len(data))
+            await within_deadline(pipe.execute())
+        return sizes
+
+    async def get_many(self, keys: list[str]) -> list[Any]:
+        if not keys:
+            return []
+        if self._out_of_budget():
+            return [None] * len(keys)
+        values = await within_deadline(self.redis.mget(keys))
+        for value in values:
+            cache_stats["redis"].record(value is not None)
+        return [self.codec.decode(x) if x is not None else None for x in values]
+
+    async def get_with_ttl(self, key: str) -> tuple[Any, float | None, int]:
+        """
+        Get the value along with the seconds left before the key expires, None if
+        it doesn't, and the size of its encoding, in one round trip.
+        """
+        return (await self.get_many_with_ttl([key]))[0]
+
+    async def get_many_with_ttl(
+        self, keys: list[str]
+    ) -> list[tuple[Any, float | None, int]]:
+        if not keys:
+            return []
+        if self._out_of_budget():
+            return [(None, None, 0)] * len(keys)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.mget(keys)
+            for key in keys:
+                pipe.pttl(key)
+            values, *ttls = await within_deadline(pipe.execute())
+        result = []
+        for value, ttl in zip(values, ttls):
+            cache_stats["redis"].record(value is not None)
+            if value is None:
+                result.append((None, None, 0))
+                continue
+            result.append(
+                (self.codec.decode(value), ttl / 1000 if ttl > 0 else None, len(value))
+            )
+        return result
+
+    async def lock(self, key: str, ttl: float) -> str | None:
+        token = uuid.uuid4().hex
+        if await within_deadline(
+            self.redis.set(key, token, px=int(ttl * 1000), nx=True)
+        ):
+            return token
+        return None
+
+    async def unlock(self, key: str, token: str) -> None:
+        # not bounded by the deadline: locks are released by the shared fills, which
+        # callers stop waiting for at their deadlines, and a lock left behind would
+        # keep the other workers waiting for it to expire
+        await self.redis.eval(UNLOCK_SCRIPT, 1, key, token)
+
+    def _out_of_budget(self) -> bool:
+        return (left := remaining()) is not None and left < self.min_budget
+
+
+@dataclass
+class LocalCacheEntry:
+    value: Any
+    size: int
+    expires_at: float
+
+
+class LocalCache:
+    """
+    In-process LRU store bounded by the number of entries and their total size.
+
+    Values are shared between the callers that read them and must not be mutated.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.bytes = 0
+        self._entries: OrderedDict[str, LocalCacheEntry] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Any:
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at <= time.monotonic():
+            self._remove(key)
+            entry = None
+        cache_stats["local"].record(entry is not None)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        return entry.value
+
+    def set(self, key: str, value: Any, size: int, ttl: float | None = None) -> None:
+        """
+        Store the value, counting `size` bytes against the bound, for the local TTL,
+        or for `ttl` seconds if that is shorter.
+        """
+        if key in self._entries:
+            self._remove(key)
+        if size > self.max_bytes:
+            return
+        ttl = min(ttl, self.ttl) if ttl else self.ttl
+        self._entries[key] = LocalCacheEntry(value, size, time.monotonic() + ttl)
+        self.bytes += size
+        while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: str) -> None:
+        self.bytes -= self._entries.pop(key).size
+
+
+class LocalCacheAdapter(CacheAdapterProtocol):
+    """
+    Serves keys from the in-process cache, falling back to the wrapped cache and
+    keeping a local copy of what it returns. Copies are sized by the encoding the
+    wrapped cache stored or returned, and aren't kept for values it didn't store.
+
+    Copies taken on a fallback live for the local TTL, or until the key expires in
+    Redis if that is sooner, so that they don't outlive it.
+    """
+
+    def __init__(self, local: LocalCache, cache: RedisAdapter):
+        self.local = local
+        self.cache = cache
+
+    async def set(self, key: str, value: Any, ttl: int | None = None) -> None:
+        if size := await self.cache.set(key, value, ttl):
+            self.local.set(key, value, size, ttl)
+
+    async def get(self, key: str) -> list | dict | None:
+        if (value := self.local.get(key)) is not None:
+            return value
+        value, ttl, size = await self.cache.get_with_ttl(key)
+        if value is not None:
+            self.local.set(key, value, size, ttl)
+        return value
+
+    async def set_many(self, items: Iterable[tuple[str, Any, int | None]]) -> None:
+        items = list(items)
+        sizes = await self.cache.set_many(items)
+        for (key, value, ttl), size in zip(items, sizes):
+            if size:
+                self.local.set(key, value, size, ttl)
+
+    async def get_many(self, keys: list[str]) -> list[Any]:
+        values = [self.local.get(key) for key in keys]
+        missing = [i for i, value in enumerate(values) if value is None]
+        if missing:
+            fetched = await self.cache.get_many_with_ttl([keys[i] for i in missing])
+            for i, (value, ttl, size) in zip(missing, fetched):
+                if value is not None:
+                    self.local.set(keys[i], value, size, ttl)
+                values[i] = value
+        return values
+
+    async def lock(self, key: str, ttl: float) -> str | None:
+        return await self.cache.lock(key, ttl)
+
+    async def unlock(self, key: str, token: str) -> None:
+        await self.cache.unlock(key, token)
+
 
 async def get_cache() -> CacheAdapterProtocol:
-    return RedisAdapter(redis_client)
+    cache = RedisAdapter(redis_client, cache_codec, min_budget)
+    if local_cache is not None:
+        return LocalCacheAdapter(local_cache, cache)
+    return cache
@@ -0,0 +1,170 @@
+from typing import Any, Protocol
+
+import orjson
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
+
+class Serializer(Protocol):
+    id: int
+
+    def dumps(self, value: Any) -> bytes:
+        ...
+
+    def loads(self, data: bytes) -> Any:
+        ...
+
+
+class Compressor(Protocol):
+    id: int
+
+    def compress(self, data: bytes) -> bytes:
+        ...
+
+    def decompress(self, data: bytes) -> bytes:
+        ...
+
+
+class OrjsonSerializer(Serializer):
+    id = 0b0001
+
+    def dumps(self, value: Any) -> bytes:
+        return orjson.dumps(value)
+
+    def loads(self, data: bytes) -> Any:
+        return orjson.loads(data)
+
+
+class MsgpackSerializer(Serializer):
+    id = 0b0010
+
+    def __init__(self):
+        if msgpack is None:
+            raise RuntimeError("the msgpack codec requires the msgpack package")
+
+    def dumps(self, value: Any) -> bytes:
+        return msgpack.packb(value)
+
+    def loads(self, data: bytes) -> Any:
+        return msgpack.unpackb(data)
+
+
+class ZstdCompressor(Compressor):
+    id = 0b0100
+
+    def __init__(self, level: int = 3):
+        if zstandard is None:
+            raise RuntimeError("zstd compression requires the zstandard package")
+        self._compressor = zstandard.ZstdCompressor(level=level)
+        self._decompressor = zstandard.ZstdDecompressor()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def decompress(self, data: bytes) -> bytes:
+        return self._decompressor.decompress(data)
+
+
+class Lz4Compressor(Compressor):
+    id = 0b1000
+
+    def __init__(self):
+        if lz4 is None:
+            raise RuntimeError("lz4 compression requires the lz4 package")
+
+    def compress(self, data: bytes) -> bytes:
+        return lz4.frame.compress(data)
+
+    def decompress(self, data: bytes) -> bytes:
+        return lz4.frame.decompress(data)
+
+
+SERIALIZERS = {"orjson": OrjsonSerializer, "msgpack": MsgpackSerializer}
+COMPRESSORS = {"zstd": ZstdCompressor, "lz4": Lz4Compressor}
+
+SERIALIZER_MASK = 0b0011
+COMPRESSOR_MASK = 0b1100
+# JSON text never starts with a control character, unlike the header byte
+LEGACY_JSON_MIN_BYTE = 0x20
+
+
+class CacheCodec:
+    """
+    Encodes cache values with the serializer, compressing the ones larger than
+    `compress_threshold` bytes.
+
+    Encoded values start with a header byte naming the serializer and compressor
+    they were written with, so that values written with any of them, or as plain
+    JSON before the header was introduced, can be decoded.
+    """
+
+    def __init__(
+        self,
+        serializer: Serializer,
+        compressor: Compressor | None = None,
+        compress_threshold: int = 1024,
+    ):
+        self.serializer = serializer
+        self.compressor = compressor
+        self.compress_threshold = compress_threshold
+        self._serializers: dict[int, Serializer] = {serializer.id: serializer}
+        self._compressors: dict[int, Compressor] = {}
+        if compressor:
+            self._compressors[compressor.id] = compressor
+
+    def encode(self, value: Any) -> bytes:
+        data = self.serializer.dumps(value)
+        header = self.serializer.id
+        if self.compressor and len(data) >= self.compress_threshold:
+            data = self.compressor.compress(data)
+            header |= self.compressor.id
+        return bytes((header,)) + data
+
+    def decode(self, data: bytes) -> Any:
+        header = data[0]
+        if header >= LEGACY_JSON_MIN_BYTE:
+            return orjson.loads(data)
+        data = data[1:]
+        if compressor_id := header & COMPRESSOR_MASK:
+            data = self._compressor(compressor_id).decompress(data)
+        return self._serializer(header & SERIALIZER_MASK).loads(data)
+
+    def _serializer(self, id: int) -> Serializer:
+        if id not in self._serializers:
+            self._serializers[id] = _by_id(SERIALIZERS, id)()
+        return self._serializers[id]
+
+    def _compressor(self, id: int) -> Compressor:
+        if id not in self._compressors:
+            self._compressors[id] = _by_id(COMPRESSORS, id)()
+        return self._compressors[id]
+
+
+def _by_id(registry: dict[str, type], id: int) -> type:
+    for cls in registry.values():
+        if cls.id == id:
+            return cls
+    raise ValueError(f"unknown cache value header {id:#06b}")
+
+
+def make_codec(
+    serializer: str, compressor: str | None = None, compress_threshold: int = 1024
+) -> CacheCodec:
+    return CacheCodec(
+        SERIALIZERS[serializer](),
+        COMPRESSORS[compressor]() if compressor else None,
+        compress_threshold,
+    )
@@ -1,15 +1,31 @@
+import asyncio
+import logging
+import random
+import time
 from abc import abstractmethod
-from dataclasses import asdict, dataclass
+from contextlib import suppress
+from dataclasses import asdict, dataclass, fields
 from enum import Enum
-from typing import Protocol
+from functools import partial
+from math import log
+from typing import Any, Awaitable, Callable, Protocol
 from uuid import UUID
 
 from elasticsearch import AsyncElasticsearch, NotFoundError
 from elasticsearch_dsl import Search
 
+from core.context import detached_task, mark_stale, remaining, within_deadline
 from db.cache import CacheAdapterProtocol
+from db.generations import IndexGenerations
+from db.keys import CacheKeyBuilder
+from db.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
 
 elastic_client: AsyncElasticsearch | None = None
+# shared by the requests of a worker to batch or hedge their queries, see db.batching
+# and db.hedging
+elastic_adapter: "ElasticAdapterProtocol | None" = None
 
 
 @dataclass
@@ -17,6 +33,8 @@ class ElasticSearchResult:
     num_hits: int
     hits: list[dict]
     docs: list[dict]
+    # the point in time to read the next page from, when searched under one
+    pit_id: str | None = None
 
 
 class ElasticIndexes(str, Enum):
@@ -25,62 +43,593 @@ class ElasticIndexes(str, Enum):
     GENRES = "genres"
 
 
+def search_result(result: dict) -> ElasticSearchResult:
+    return ElasticSearchResult(
+        # not counted when searched with track_total_hits disabled
+        num_hits=result["hits"].get("total", {}).get("value", 0),
+        hits=result["hits"]["hits"],
+        docs=[x["_source"] for x in result["hits"]["hits"]],
+        pit_id=result.get("pit_id"),
+    )
+
+
 class ElasticAdapterProtocol(Protocol):
     @abstractmethod
-    async def get(self, index: str, id: UUID) -> dict | None:
+    async def get(
+        self, index: str, id: UUID, fields: list[str] | None = None
+    ) -> dict | None:
+        """
+        Get a document, or None if it isn't found. Given `fields`, only those fields
+        of the document are returned.
+        """
+        ...
+
+    @abstractmethod
+    async def get_many(
+        self, index: str, ids: list[UUID], fields: list[str] | None = None
+    ) -> list[dict | None]:
+        """
+        Get documents in the order of `ids`, with None for the ones not found.
+        Given `fields`, only those fields of the documents are returned.
+        """
         ...
 
     @abstractmethod
     async def search(self, search: Search) -> ElasticSearchResult:
         ...
 
+    @abstractmethod
+    async def open_point_in_time(self, index: str, keep_alive: str) -> str:
+        ...
+
+    @abstractmethod
+    async def close_point_in_time(self, pit_id: str) -> None:
+        ...
+
 
 class ElasticAdapter(ElasticAdapterProtocol):
+    """
+    Queries are bounded by the request's deadline: Elasticsearch is asked to answer
+    within the time left, and the query is cancelled once it runs out.
+    """
+
     def __init__(self, elastic: AsyncElasticsearch):
         self.elastic = elastic
 
-    async def get(self, index: str, id: UUID) -> dict | None:
+    async def get(
+        self,
+        index: str,
+        id: UUID,
+        fields: list[str] | None = None,
+        *,
+        preference: str | None = None,
+    ) -> dict | None:
+        params = _params(fields, preference)
         try:
-            result = await self.elastic.get(index=index, id=str(id))
+            result = await within_deadline(
+                self.elastic.get(index=index, id=str(id), **params, **_timeout())
+            )
         except NotFoundError:
             return None
         return result["_source"]
 
+    async def get_many(
+        self,
+        index: str,
+        ids: list[UUID],
+        fields: list[str] | None = None,
+        *,
+        preference: str | None = None,
+    ) -> list[dict | None]:
+        if not ids:
+            return []
+        params = _params(fields, preference)
+        result = await within_deadline(
+            self.elastic.mget(
+                index=index, body={"ids": list(map(str, ids))}, **params, **_timeout()
+            )
+        )
+        return [doc["_source"] if doc.get("found") else None for doc in result["docs"]]
+
     async def search(self, search: Search) -> ElasticSearchResult:
-        result = await self.elastic.search(
-            index=search._index, body=search.to_dict(), **search._params
+        result = await within_deadline(
+            self.elastic.search(
+                index=search._index,
+                body=search.to_dict(),
+                **search._params,
+                **_timeout(),
+            )
         )
-        return ElasticSearchResult(
-            num_hits=result["hits"]["total"]["value"],
-            hits=result["hits"]["hits"],
-            docs=[x["_source"] for x in result["hits"]["hits"]],
+        return search_result(result)
+
+    async def open_point_in_time(self, index: str, keep_alive: str) -> str:
+        result = await within_deadline(
+            self.elastic.open_point_in_time(
+                index=index, keep_alive=keep_alive, **_timeout()
+            )
         )
+        return result["id"]
+
+    async def close_point_in_time(self, pit_id: str) -> None:
+        with suppress(NotFoundError):
+            await self.elastic.close_point_in_time(body={"id": pit_id})
+
+
+def _params(fields: list[str] | None, preference: str | None) -> dict:
+    params = {}
+    if fields:
+        params["_source_includes"] = ",".join(fields)
+    # the shard copies to read from, the same for the same value
+    if preference:
+        params["preference"] = preference
+    return params
+
+
+def _timeout() -> dict:
+    """
+    Parameters asking Elasticsearch to answer within the time left to the request.
+    """
+    if (timeout := remaining()) is None:
+        return {}
+    return {"request_timeout": max(timeout, 0.001)}
+
+
+@dataclass
+class CachePolicy:
+    ttl: int
+    # TTL of not found documents and empty search results, defaults to `ttl`
+    negative_ttl: int | None = None
+    # fraction of the TTL added at random to each key's expiry
+    jitter: float = 0.0
+    # how long a worker may hold the lock on a key it is filling
+    lock_ttl: float = 5.0
+    # how long other workers wait for the key to be filled before querying themselves
+    lock_wait: float = 1.0
+    lock_poll_interval: float = 0.05
+    # how eagerly entries are refreshed ahead of their expiry, 0 disables it
+    early_refresh_beta: float = 1.0
+    # how long expired entries, other than negative ones, are kept to be served when
+    # Elasticsearch fails
+    stale_ttl: int = 0
+    # how long to wait for Elasticsearch before serving an expired entry
+    stale_deadline: float | None = None
+
+    def expire(self, negative: bool = False) -> int:
+        """
+        Spread the TTL by up to `jitter` of its value so that keys written together
+        don't expire together.
+        """
+        ttl = self.ttl
+        if negative and self.negative_ttl is not None:
+            ttl = self.negative_ttl
+        return ttl + random.randint(0, int(ttl * self.jitter))
+
+    def should_refresh(self, delta: float, expires_at: float) -> bool:
+        """
+        XFetch: refresh a value taking `delta` seconds to compute once the current
+        time, pushed forward by a random multiple of `delta`, passes its expiry.
+        """
+        if not expires_at or not self.early_refresh_beta:
+            return False
+        gap = delta * self.early_refresh_beta * -log(1 - random.random())
+        return time.time() + gap >= expires_at
+
+
+@dataclass
+class CacheEntry:
+    """
+    A cached value, wrapped so that a cached None or empty result is told apart from
+    a key that isn't cached.
+
+    Entries also keep how long the value took to compute and when it expires, for
+    refreshing it ahead of expiry.
+    """
+
+    value: Any
+    # seconds the value took to compute
+    delta: float = 0.0
+    # unix time the value expires at
+    expires_at: float = 0.0
+
+    @classmethod
+    def load(cls, cached: Any) -> "CacheEntry | None":
+        try:
+            return cls(**cached)
+        except TypeError:
+            # written before values were wrapped, treated as not cached
+            return None
+
+    def dump(self) -> dict:
+        return {field.name: getattr(self, field.name) for field in fields(self)}
+
+    @property
+    def is_expired(self) -> bool:
+        return bool(self.expires_at) and self.expires_at <= time.time()
 
 
 class CachedElasticDecorator(ElasticAdapterProtocol):
+    """
+    Caches Elasticsearch responses, making sure that a missing key is filled by a
+    single query: concurrent misses in a process share one in-flight query, and
+    across processes the query is guarded by a short-lived cache lock.
+
+    Not found documents and empty search results are cached as well, for the
+    policy's negative TTL.
+
+    Entries are refreshed in the background ahead of their expiry, with a
+    probability growing as the expiry nears and as the value takes longer to
+    compute (XFetch), so hot keys are served from the cache without interruption.
+
+    Expired entries other than negative ones are kept for the policy's stale TTL:
+    if Elasticsearch fails or doesn't answer within the stale deadline, the expired
+    entry is served and the response is marked stale.
+    """
+
+    _flights = SingleFlight()
+    _refreshes: set[asyncio.Task] = set()
+
     def __init__(
-        self, elastic: ElasticAdapterProtocol, cache: CacheAdapterProtocol, ttl: int
+        self,
+        elastic: ElasticAdapterProtocol,
+        cache: CacheAdapterProtocol,
+        policy: CachePolicy,
+        keys: CacheKeyBuilder,
+        generations: IndexGenerations | None = None,
     ):
         self.elastic = elastic
         self.cache = cache
-        self.ttl = ttl
+        self.policy = policy
+        self.keys = keys
+        self.generations = generations
+
+    async def get(
+        self, index: str, id: UUID, fields: list[str] | None = None
+    ) -> dict | None:
+        if fields:
+            fields = sorted(fields)
+            key = await self._key(index, "get", id, fields)
+        else:
+            key = await self._key(index, "get", id)
+        return await self._get_or_fill(
+            key, lambda: self.elastic.get(index, id, fields), lambda doc: doc is None
+        )
+
+    async def get_many(
+        self, index: str, ids: list[UUID], fields: list[str] | None = None
+    ) -> list[dict | None]:
+        """
+        Serve the documents that are cached and get the rest with a single query,
+        caching them one key per document, shared with `get`. Missing documents
+        are filled like single keys are: concurrent misses in a process share the
+        query, and across processes each key is guarded by its cache lock.
+
+        Projections given `fields` are cached under keys of their own, but whole
+        documents cached by `get` are looked up in the same round trip and
+        projected instead of querying for them.
+        """
+        generation = await self._generation(index)
+        keys = [self.keys.build(index, "get", id, generation=generation) for id in ids]
+        if not fields:
+            entries = await self._get_entries(keys)
+        else:
+            fields = sorted(fields)
+            whole_keys = keys
+            keys = [
+                self.keys.build(index, "get", id, fields, generation=generation)
+                for id in ids
+            ]
+            cached = await self._get_entries(keys + whole_keys)
+            entries = [
+                _project_entry(whole, fields) if _is_fresh(whole) else own
+                for own, whole in zip(cached[: len(ids)], cached[len(ids) :])
+            ]
+        missing = [
+            i for i, entry in enumerate(entries) if not entry or entry.is_expired
+        ]
+        if not missing:
+            return [entry.value for entry in entries]
+        missing_ids = {keys[i]: ids[i] for i in missing}
+        stale = {keys[i]: entries[i] for i in missing}
 
-    async def get(self, index: str, id: UUID) -> dict | None:
-        key = str((index, id))
-        if cached := await self.cache.get(key):
-            return cached
-        data = await self.elastic.get(index, id)
-        await self.cache.set(key, data)
-        return data
+        async def fetch(keys: list[str]) -> list[dict | None]:
+            return await self.elastic.get_many(
+                index, [missing_ids[key] for key in keys], fields
+            )
+
+        async def fill(keys: list[str]) -> list[CacheEntry]:
+            return await self._fill_many(keys, fetch, [stale[key] for key in keys])
+
+        try:
+            filled = await self._with_stale_deadline(
+                self._flights.do_many([keys[i] for i in missing], fill),
+                all(stale.values()),
+            )
+        except Exception as e:
+            if not all(stale.values()):
+                raise
+            logger.warning("serving stale documents: %r", e)
+            filled = [entries[i] for i in missing]
+        for i, entry in zip(missing, filled):
+            entries[i] = entry
+            if entry.is_expired:
+                mark_stale()
+        return [entry.value for entry in entries]
 
     async def search(self, search: Search) -> ElasticSearchResult:
-        key = str((search._index, search.to_dict(), search._params))
-        if cached := await self.cache.get(key):
-            return ElasticSearchResult(**cached)
-        data = await self.elastic.search(search)
-        await self.cache.set(key, asdict(data))
-        return data
+        if "pit" in search._extra:
+            # results under a point in time are only read once
+            return await self.elastic.search(search)
+        key = await self._key(
+            ",".join(search._index), "search", search.to_dict(), search._params
+        )
+
+        async def fetch() -> dict:
+            return asdict(await self.elastic.search(search))
+
+        return ElasticSearchResult(
+            **await self._get_or_fill(key, fetch, lambda result: not result["docs"])
+        )
+
+    async def open_point_in_time(self, index: str, keep_alive: str) -> str:
+        return await self.elastic.open_point_in_time(index, keep_alive)
+
+    async def close_point_in_time(self, pit_id: str) -> None:
+        await self.elastic.close_point_in_time(pit_id)
+
+    async def _key(self, namespace: str, *parts: Any) -> str:
+        generation = await self._generation(namespace)
+        return self.keys.build(namespace, *parts, generation=generation)
+
+    async def _generation(self, namespace: str) -> int:
+        if self.generations is None:
+            return 0
+        return await self.generations.get(namespace)
+
+    async def _get_or_fill(
+        self,
+        key: str,
+        fetch: Callable[[], Awaitable[Any]],
+        is_empty: Callable[[Any], bool],
+    ) -> Any:
+        entry = await self._get_entry(key)
+        if entry and not entry.is_expired:
+            if self.policy.should_refresh(entry.delta, entry.expires_at):
+                self._refresh_in_background(key, fetch, is_empty)
+            return entry.value
+        stale = entry
+        try:
+            entry = await self._with_stale_deadline(
+                self._flights.do(key, partial(self._fill, key, fetch, is_empty, stale)),
+                stale is not None,
+            )
+        except Exception as e:
+            if stale is None:
+                raise
+            logger.warning("serving a stale cache entry: %r", e)
+        if entry.is_expired:
+            mark_stale()
+        return entry.value
+
+    async def _fill(
+        self,
+        key: str,
+        fetch: Callable[[], Awaitable[Any]],
+        is_empty: Callable[[Any], bool],
+        stale: CacheEntry | None,
+    ) -> CacheEntry:
+        """
+        Compute the entry under the cache lock. If another process holds the lock,
+        serve the stale entry if there is one, or wait for the other process's
+        result.
+        """
+        lock_key = f"lock:{key}"
+        token = await self.cache.lock(lock_key, self.policy.lock_ttl)
+        if not token and stale:
+            return stale
+        if not token and (entry := (await self._wait_for_fills([key]))[0]):
+            return entry
+        try:
+            return await self._compute(key, fetch, is_empty)
+        finally:
+            if token:
+                await self.cache.unlock(lock_key, token)
+
+    async def _fill_many(
+        self,
+        keys: list[str],
+        fetch: Callable[[list[str]], Awaitable[list]],
+        stale: list[CacheEntry | None],
+    ) -> list[CacheEntry]:
+        """
+        Like `_fill` for documents, getting the ones that aren't served stale nor
+        filled by other processes with a single query.
+        """
+        lock_keys = [f"lock:{key}" for key in keys]
+        tokens = await asyncio.gather(
+            *(self.cache.lock(x, self.policy.lock_ttl) for x in lock_keys)
+        )
+        locked = [i for i, token in enumerate(tokens) if token]
+        waiting = [i for i, token in enumerate(tokens) if not token and not stale[i]]
+        entries = [None if token else entry for token, entry in zip(tokens, stale)]
+        try:
+            filled, computed = await asyncio.gather(
+                self._wait_for_fills([keys[i] for i in waiting]),
+                self._compute_many([keys[i] for i in locked], fetch),
+            )
+            for i, entry in zip(waiting + locked, filled + computed):
+                entries[i] = entry
+            # keys the other processes didn't fill in time
+            if late := [i for i, entry in enumerate(entries) if entry is None]:
+                computed = await self._compute_many([keys[i] for i in late], fetch)
+                for i, entry in zip(late, computed):
+                    entries[i] = entry
+            return entries
+        finally:
+            await asyncio.gather(
+                *(self.cache.unlock(lock_keys[i], tokens[i]) for i in locked)
+            )
+
+    async def _with_stale_deadline(self, query: Awaitable, has_stale: bool) -> Any:
+        """
+        Bound the query by the stale deadline when there is a stale entry to fall
+        back to.
+        """
+        if not has_stale or self.policy.stale_deadline is None:
+            return await query
+        return await asyncio.wait_for(query, self.policy.stale_deadline)
+
+    async def _refresh(
+        self,
+        key: str,
+        fetch: Callable[[], Awaitable[Any]],
+        is_empty: Callable[[Any], bool],
+    ) -> None:
+        """
+        Recompute the entry unless another process is already doing so.
+        """
+        lock_key = f"lock:{key}"
+        if not (token := await self.cache.lock(lock_key, self.policy.lock_ttl)):
+            return
+        try:
+            await self._compute(key, fetch, is_empty)
+        finally:
+            await self.cache.unlock(lock_key, token)
+
+    async def _compute(
+        self,
+        key: str,
+        fetch: Callable[[], Awaitable[Any]],
+        is_empty: Callable[[Any], bool],
+    ) -> CacheEntry:
+        started_at = time.monotonic()
+        data = await fetch()
+        delta = time.monotonic() - started_at
+        negative = is_empty(data)
+        ttl = self.policy.expire(negative)
+        entry = CacheEntry(data, delta, time.time() + ttl)
+        await self.cache.set(key, entry.dump(), self._keep(ttl, negative))
+        return entry
+
+    async def _compute_many(
+        self, keys: list[str], fetch: Callable[[list[str]], Awaitable[list]]
+    ) -> list[CacheEntry]:
+        """
+        Like `_compute` for documents got with a single query, whose time is counted
+        for each of them.
+        """
+        if not keys:
+            return []
+        started_at = time.monotonic()
+        docs = await fetch(keys)
+        delta = time.monotonic() - started_at
+        entries, items = [], []
+        for key, doc in zip(keys, docs):
+            ttl = self.policy.expire(doc is None)
+            entries.append(CacheEntry(doc, delta, time.time() + ttl))
+            items.append((key, entries[-1].dump(), self._keep(ttl, doc is None)))
+        await self.cache.set_many(items)
+        return entries
+
+    def _refresh_in_background(
+        self,
+        key: str,
+        fetch: Callable[[], Awaitable[Any]],
+        is_empty: Callable[[Any], bool],
+    ) -> None:
+        task = detached_task(
+            self._flights.do(
+                f"refresh:{key}", partial(self._refresh, key, fetch, is_empty)
+            )
+        )
+        self._refreshes.add(task)
+        task.add_done_callback(self._on_refreshed)
+
+    def _on_refreshed(self, task: asyncio.Task) -> None:
+        self._refreshes.discard(task)
+        if not task.cancelled() and (error := task.exception()):
+            logger.warning("failed to refresh a cache entry", exc_info=error)
+
+    async def _get_entry(self, key: str) -> CacheEntry | None:
+        if (cached := await self.cache.get(key)) is None:
+            return None
+        return CacheEntry.load(cached)
+
+    async def _get_entries(self, keys: list[str]) -> list[CacheEntry | None]:
+        return [
+            CacheEntry.load(cached) if cached is not None else None
+            for cached in await self.cache.get_many(keys)
+        ]
+
+    async def _wait_for_fills(self, keys: list[str]) -> list[CacheEntry | None]:
+        """
+        Poll the cache while other processes fill the keys, giving up after
+        `lock_wait` seconds on the ones still missing.
+        """
+        entries: list[CacheEntry | None] = [None] * len(keys)
+        deadline = time.monotonic() + self.policy.lock_wait
+        if (left := remaining()) is not None:
+            deadline = min(deadline, time.monotonic() + left)
+        while not all(entries) and time.monotonic() < deadline:
+            await asyncio.sleep(self.policy.lock_poll_interval)
+            waiting = [i for i, entry in enumerate(entries) if entry is None]
+            cached = await self._get_entries([keys[i] for i in waiting])
+            for i, entry in zip(waiting, cached):
+                if entry and not entry.is_expired:
+                    entries[i] = entry
+        return entries
+
+    def _keep(self, ttl: int, negative: bool = False) -> int:
+        """
+        How long to keep an entry expiring after `ttl` seconds in the cache. Not
+        found documents and empty results aren't worth serving stale, so they are
+        dropped as they expire.
+        """
+        if negative:
+            return ttl
+        return ttl + self.policy.stale_ttl
+
+
+def project(doc: dict, fields: list[str]) -> dict:
+    """
+    Keep the `fields` of the document, given as dotted paths the way `_source`
+    filtering takes them.
+    """
+    projected = {}
+    for field in fields:
+        name, _, rest = field.partition(".")
+        if name not in doc:
+            continue
+        value = doc[name]
+        if not rest:
+            projected[name] = value
+            continue
+        if isinstance(value, dict):
+            nested = project(value, [rest])
+            projected[name] = _merge(projected.get(name, {}), nested)
+        elif isinstance(value, list):
+            nested = [project(x, [rest]) if isinstance(x, dict) else x for x in value]
+            previous = projected.get(name, [{} for _ in nested])
+            projected[name] = [_merge(a, b) for a, b in zip(previous, nested)]
+    return projected
+
+
+def _merge(a: Any, b: Any) -> Any:
+    if isinstance(a, dict) and isinstance(b, dict):
+        return {**a, **{k: _merge(a.get(k), v) for k, v in b.items()}}
+    return b
+
+
+def _is_fresh(entry: CacheEntry | None) -> bool:
+    return entry is not None and not entry.is_expired
+
+
+def _project_entry(entry: CacheEntry, fields: list[str]) -> CacheEntry:
+    if entry.value is None:
+        return entry
+    return CacheEntry(project(entry.value, fields), entry.delta, entry.expires_at)
 
 
 async def get_elastic() -> ElasticAdapterProtocol:
+    if elastic_adapter is not None:
+        return elastic_adapter
     return ElasticAdapter(elastic_client)
@@ -0,0 +1,42 @@
+import time
+from enum import Enum
+
+from aioredis import Redis
+
+index_generations: "IndexGenerations | None" = None
+
+
+class IndexGenerations:
+    """
+    Generation counters of Elasticsearch indexes, kept in Redis and embedded in
+    cache keys: bumping an index's generation invalidates all of its cached keys.
+
+    Generations are read from Redis at most once per `ttl` seconds per index.
+    """
+
+    def __init__(self, redis: Redis, prefix: str, ttl: float):
+        self.redis = redis
+        self.prefix = prefix
+        self.ttl = ttl
+        self._generations: dict[str, tuple[int, float]] = {}
+
+    async def get(self, index: str) -> int:
+        generation, read_at = self._generations.get(index, (0, None))
+        if read_at is None or time.monotonic() - read_at > self.ttl:
+            generation = int(await self.redis.get(self._key(index)) or 0)
+            self._generations[index] = (generation, time.monotonic())
+        return generation
+
+    async def bump(self, index: str) -> int:
+        generation = await self.redis.incr(self._key(index))
+        self._generations[index] = (generation, time.monotonic())
+        return generation
+
+    def _key(self, index: str) -> str:
+        if isinstance(index, Enum):
+            index = index.value
+        return f"{self.prefix}:generation:{index}"
+
+
+async def get_generations() -> IndexGenerations | None:
+    return index_generations
@@ -0,0 +1,172 @@
+import asyncio
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass
+from typing import Awaitable, Callable, TypeVar
+from uuid import UUID
+
+from elasticsearch import AsyncElasticsearch
+from elasticsearch_dsl import Search
+
+from db.elastic import ElasticAdapter, ElasticAdapterProtocol, ElasticSearchResult
+
+T = TypeVar("T")
+
+
+class LatencyTracker:
+    """
+    Latencies of the last `window` queries, to delay hedges by a percentile of them.
+
+    The percentile is worked out again every `refresh_every` latencies rather than
+    on every query, since sorting the window is what it costs.
+    """
+
+    def __init__(
+        self,
+        percentile: float,
+        window: int = 1000,
+        min_samples: int = 100,
+        refresh_every: int = 50,
+        initial_delay: float = 0.05,
+        min_delay: float = 0.0,
+    ):
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.refresh_every = refresh_every
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self._latencies: deque[float] = deque(maxlen=window)
+        self._delay: float | None = None
+        self._recorded = 0
+
+    def record(self, seconds: float) -> None:
+        self._latencies.append(seconds)
+        self._recorded += 1
+        if self._recorded >= self.refresh_every:
+            self._delay = None
+
+    def delay(self) -> float:
+        if len(self._latencies) < self.min_samples:
+            return self.initial_delay
+        if self._delay is None:
+            latencies = sorted(self._latencies)
+            index = min(len(latencies) - 1, int(len(latencies) * self.percentile / 100))
+            self._delay = max(latencies[index], self.min_delay)
+            self._recorded = 0
+        return self._delay
+
+
+@dataclass
+class HedgingStats:
+    queries: int = 0
+    # queries a hedge was sent for, and of them the ones the hedge answered first
+    hedged: int = 0
+    hedge_wins: int = 0
+
+
+# hedging counters of this process
+hedging_stats = HedgingStats()
+
+
+class HedgingElasticAdapter(ElasticAdapterProtocol):
+    """
+    Sends a duplicate of a read that hasn't been answered within a percentile of the
+    recent latencies of its kind, to be read from other shard copies, and returns
+    whichever answer comes first, cancelling the other.
+
+    The first attempt is sent as is, leaving the choice of shard copies to adaptive
+    replica selection, and the duplicate with a random `preference`, so that it most
+    likely goes to other copies than the slow one.
+    """
+
+    def __init__(
+        self,
+        elastic: AsyncElasticsearch,
+        percentile: float,
+        initial_delay: float,
+        min_delay: float,
+    ):
+        self.adapter = ElasticAdapter(elastic)
+        self._latencies = {
+            operation: LatencyTracker(
+                percentile, initial_delay=initial_delay, min_delay=min_delay
+            )
+            for operation in ("get", "get_many", "search")
+        }
+
+    async def get(
+        self, index: str, id: UUID, fields: list[str] | None = None
+    ) -> dict | None:
+        return await self._hedged(
+            "get",
+            lambda preference: self.adapter.get(
+                index, id, fields, preference=preference
+            ),
+        )
+
+    async def get_many(
+        self, index: str, ids: list[UUID], fields: list[str] | None = None
+    ) -> list[dict | None]:
+        return await self._hedged(
+            "get_many",
+            lambda preference: self.adapter.get_many(
+                index, ids, fields, preference=preference
+            ),
+        )
+
+    async def search(self, search: Search) -> ElasticSearchResult:
+        if "pit" in search._extra:
+            # a point in time pins the shard copies already
+            return await self.adapter.search(search)
+        return await self._hedged(
+            "search",
+            lambda preference: self.adapter.search(
+                search.params(preference=preference) if preference else search
+            ),
+        )
+
+    async def open_point_in_time(self, index: str, keep_alive: str) -> str:
+        return await self.adapter.open_point_in_time(index, keep_alive)
+
+    async def close_point_in_time(self, pit_id: str) -> None:
+        await self.adapter.close_point_in_time(pit_id)
+
+    async def _hedged(
+        self, operation: str, query: Callable[[str | None], Awaitable[T]]
+    ) -> T:
+        latencies = self._latencies[operation]
+
+        async def attempt(preference: str | None = None) -> T:
+            started_at = time.monotonic()
+            try:
+                return await query(preference)
+            finally:
+                # attempts cut short by their hedge or failing took at least this
+                # long, leaving them out would hide the slow ones from the delay
+                latencies.record(time.monotonic() - started_at)
+
+        hedging_stats.queries += 1
+        primary = asyncio.create_task(attempt())
+        pending = {primary}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=latencies.delay())
+            if not done:
+                hedging_stats.hedged += 1
+                pending.add(asyncio.create_task(attempt(uuid.uuid4().hex)))
+            while not done or (not any(self._succeeded(x) for x in done) and pending):
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+            # with both attempts failed, the last error is raised
+            task = next((x for x in done if self._succeeded(x)), next(iter(done)))
+            if task is not primary:
+                hedging_stats.hedge_wins += 1
+            return task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    @staticmethod
+    def _succeeded(task: asyncio.Task) -> bool:
+        return task.exception() is None
@@ -0,0 +1,38 @@
+import hashlib
+from enum import Enum
+from typing import Any, Mapping
+
+import orjson
+
+
+class CacheKeyBuilder:
+    """
+    Builds short cache keys of the form
+    `<prefix>:<namespace>:v<version>:g<generation>:<digest>`.
+
+    The digest is taken over a canonical encoding of the key parts, so equal queries
+    map to the same key regardless of dict ordering. Bumping a namespace's version
+    on deploy, or its generation at runtime, invalidates its keys only.
+    """
+
+    def __init__(self, prefix: str, versions: Mapping[str, int] | None = None):
+        self.prefix = prefix
+        self.versions = versions or {}
+
+    def build(self, namespace: str, *parts: Any, generation: int = 0) -> str:
+        if isinstance(namespace, Enum):
+            namespace = namespace.value
+        version = self.versions.get(namespace, 1)
+        return f"{self.prefix}:{namespace}:v{version}:g{generation}:{digest(parts)}"
+
+
+def canonical(value: Any) -> bytes:
+    """
+    Encode the value as JSON with sorted keys; UUIDs, enums and datetimes are
+    encoded by orjson in their canonical forms, anything else by its `str`.
+    """
+    return orjson.dumps(value, default=str, option=orjson.OPT_SORT_KEYS)
+
+
+def digest(value: Any) -> str:
+    return hashlib.blake2b(canonical(value), digest_size=16).hexdigest()
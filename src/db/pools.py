@@ -0,0 +1,202 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from types import SimpleNamespace
+
+import aiohttp
+from aioredis import BlockingConnectionPool, Redis
+from aioredis.connection import Connection
+from elasticsearch import AIOHttpConnection, AsyncElasticsearch
+from elasticsearch._async.http_aiohttp import ESClientResponse
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PoolStats:
+    # connections handed out to commands and requests
+    acquired: int = 0
+    # connections opened
+    created: int = 0
+    # time spent getting a connection, waiting for a free one or opening a new one
+    wait_seconds: float = 0.0
+    max_wait_seconds: float = 0.0
+
+    def record_wait(self, seconds: float) -> None:
+        self.wait_seconds += seconds
+        self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+
+
+# connection pool counters of this process per client
+pool_stats: dict[str, PoolStats] = {"elastic": PoolStats(), "redis": PoolStats()}
+
+
+class MeteredConnectionPool(BlockingConnectionPool):
+    """
+    Redis connection pool of a fixed size, where commands wait for a free
+    connection when all of them are in use, counted in `pool_stats`.
+
+    The pool keeps count of its connections itself, through the methods making,
+    handing out and releasing them.
+    """
+
+    def reset(self):
+        super().reset()
+        self._opened = 0
+        self._in_use: set[Connection] = set()
+
+    def make_connection(self):
+        pool_stats["redis"].created += 1
+        self._opened += 1
+        return super().make_connection()
+
+    async def get_connection(self, command_name, *keys, **options):
+        started_at = time.monotonic()
+        try:
+            connection = await super().get_connection(command_name, *keys, **options)
+        finally:
+            pool_stats["redis"].acquired += 1
+            pool_stats["redis"].record_wait(time.monotonic() - started_at)
+        self._in_use.add(connection)
+        return connection
+
+    async def release(self, connection: Connection):
+        # also called for connections that failed to connect before being handed out
+        self._in_use.discard(connection)
+        await super().release(connection)
+
+    def usage(self) -> dict:
+        return {
+            "size": self.max_connections,
+            "open": self._opened,
+            "in_use": len(self._in_use),
+        }
+
+
+class MeteredTCPConnector(aiohttp.TCPConnector):
+    """
+    HTTP connector counting the connections it handed out that aren't released yet.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.in_use = 0
+
+    async def connect(self, req, traces, timeout) -> aiohttp.connector.Connection:
+        connection = await super().connect(req, traces, timeout)
+        self.in_use += 1
+        connection.add_callback(self._on_released)
+        return connection
+
+    def _on_released(self) -> None:
+        self.in_use -= 1
+
+
+class MeteredAIOHttpConnection(AIOHttpConnection):
+    """
+    Elasticsearch connection keeping idle HTTP connections open for
+    `keepalive_timeout` seconds, with its pool counted in `pool_stats`.
+
+    The client takes no connector nor tracing options, so the session is made here
+    as the client would make it, with a connector and tracing of our own. This
+    relies on the client's internals, which is why its version is pinned and the
+    metering tested against the running app.
+    """
+
+    def __init__(
+        self, *args, maxsize: int = 10, keepalive_timeout: float = 15.0, **kwargs
+    ):
+        super().__init__(*args, maxsize=maxsize, **kwargs)
+        self.maxsize = maxsize
+        self.keepalive_timeout = keepalive_timeout
+
+    async def _create_aiohttp_session(self):
+        if self.loop is None:
+            self.loop = asyncio.get_running_loop()
+        self.session = aiohttp.ClientSession(
+            headers=self.headers,
+            skip_auto_headers=("accept", "accept-encoding", "user-agent"),
+            auto_decompress=True,
+            cookie_jar=aiohttp.DummyCookieJar(),
+            response_class=ESClientResponse,
+            connector=MeteredTCPConnector(
+                limit=self.maxsize,
+                keepalive_timeout=self.keepalive_timeout,
+                use_dns_cache=True,
+                enable_cleanup_closed=True,
+                ssl=self._ssl_context,
+            ),
+            trace_configs=[_trace_config()],
+        )
+
+    def usage(self) -> dict:
+        """
+        How many connections the pool holds at most and how many are in use. Open
+        ones aren't counted, aiohttp closes idle connections without telling.
+        """
+        if self.session is None:
+            return {"size": self.maxsize, "in_use": 0}
+        connector = self.session.connector
+        return {"size": connector.limit, "in_use": connector.in_use}
+
+
+def _trace_config() -> aiohttp.TraceConfig:
+    stats = pool_stats["elastic"]
+
+    async def on_request_start(session, context: SimpleNamespace, params) -> None:
+        context.wait_seconds = 0.0
+
+    async def on_request_end(session, context: SimpleNamespace, params) -> None:
+        stats.acquired += 1
+        stats.record_wait(context.wait_seconds)
+
+    async def on_started(session, context: SimpleNamespace, params) -> None:
+        context.started_at = time.monotonic()
+
+    async def on_ended(session, context: SimpleNamespace, params) -> None:
+        context.wait_seconds += time.monotonic() - context.started_at
+
+    async def on_connection_created(session, context, params) -> None:
+        stats.created += 1
+
+    trace = aiohttp.TraceConfig()
+    trace.on_request_start.append(on_request_start)
+    trace.on_request_end.append(on_request_end)
+    trace.on_request_exception.append(on_request_end)
+    trace.on_connection_queued_start.append(on_started)
+    trace.on_connection_queued_end.append(on_ended)
+    trace.on_connection_create_start.append(on_started)
+    trace.on_connection_create_end.append(on_ended)
+    trace.on_connection_create_end.append(on_connection_created)
+    return trace
+
+
+async def open_connections(
+    redis: Redis, elastic: AsyncElasticsearch, redis_count: int, elastic_count: int
+) -> None:
+    """
+    Open connections ahead of the first requests with concurrent pings, each
+    holding a connection of its own. Failures are logged, not raised, since the
+    connections are opened on demand anyway.
+    """
+    results = await asyncio.gather(
+        *(redis.ping() for _ in range(redis_count)),
+        *(elastic.ping() for _ in range(elastic_count)),
+        return_exceptions=True,
+    )
+    if errors := [x for x in results if isinstance(x, Exception)]:
+        logger.warning("failed to open %s connections: %r", len(errors), errors[0])
+
+
+def redis_pool_usage(redis: Redis) -> dict:
+    pool = redis.connection_pool
+    return pool.usage() if isinstance(pool, MeteredConnectionPool) else {}
+
+
+def elastic_pool_usage(elastic: AsyncElasticsearch) -> list[dict]:
+    return [
+        connection.usage()
+        for connection in elastic.transport.connection_pool.connections
+        if isinstance(connection, MeteredAIOHttpConnection)
+    ]
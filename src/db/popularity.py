@@ -0,0 +1,61 @@
+import asyncio
+import logging
+from collections import Counter, defaultdict
+from enum import Enum
+from uuid import UUID
+
+from aioredis import Redis
+
+logger = logging.getLogger(__name__)
+
+popularity: "Popularity | None" = None
+
+
+class Popularity:
+    """
+    Counts requests per document in Redis sorted sets, one per index.
+
+    Counts are buffered in process and flushed every `flush_interval` seconds, and
+    only the `max_size` most requested documents of an index are kept.
+    """
+
+    def __init__(self, redis: Redis, prefix: str, max_size: int):
+        self.redis = redis
+        self.prefix = prefix
+        self.max_size = max_size
+        self._counts: defaultdict[str, Counter] = defaultdict(Counter)
+
+    def record(self, index: str, id: UUID) -> None:
+        self._counts[self._key(index)][str(id)] += 1
+
+    async def top(self, index: str, count: int) -> list[str]:
+        ids = await self.redis.zrevrange(self._key(index), 0, count - 1)
+        return [id.decode() for id in ids]
+
+    async def flush(self) -> None:
+        counts, self._counts = self._counts, defaultdict(Counter)
+        if not counts:
+            return
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for key, key_counts in counts.items():
+                for id, count in key_counts.items():
+                    pipe.zincrby(key, count, id)
+                pipe.zremrangebyrank(key, 0, -self.max_size - 1)
+            await pipe.execute()
+
+    async def run(self, flush_interval: float) -> None:
+        while True:
+            await asyncio.sleep(flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("failed to flush request counts")
+
+    def _key(self, index: str) -> str:
+        if isinstance(index, Enum):
+            index = index.value
+        return f"{self.prefix}:popularity:{index}"
+
+
+async def get_popularity() -> Popularity | None:
+    return popularity
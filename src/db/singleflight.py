@@ -0,0 +1,111 @@
+import asyncio
+from functools import partial
+from typing import Any, Awaitable, Callable
+
+from core.context import RequestContext, detached_task, request_context, within_deadline
+
+
+class Flight:
+    """
+    A call in flight and the callers waiting on it.
+
+    The call runs with a request context of its own, whose deadline is the latest
+    of its callers', or none if one of them has none, so that its queries ask
+    Elasticsearch to answer within the time someone still waits for them.
+    """
+
+    def __init__(self, func: Callable[[], Awaitable[Any]]):
+        self.context = RequestContext()
+        self.waiters = 0
+        self.task = detached_task(func(), self.context)
+
+    def join(self) -> None:
+        caller = request_context.get()
+        deadline = caller.deadline if caller else None
+        if not self.waiters:
+            self.context.deadline = deadline
+        elif self.context.deadline is not None:
+            self.context.deadline = deadline and max(deadline, self.context.deadline)
+        self.waiters += 1
+
+    def leave(self) -> bool:
+        """
+        Stop waiting on the call, cancelling it if no caller waits anymore, in which
+        case True is returned.
+        """
+        self.waiters -= 1
+        if self.waiters or self.task.done():
+            return False
+        self.task.cancel()
+        return True
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls made with the same key: the first caller starts the
+    call, the ones arriving while it is in flight await its result.
+
+    The call runs in its own task, so a cancelled caller doesn't cancel the call for
+    the others waiting on it. Each caller stops waiting at its own deadline, and the
+    call is cancelled once every caller has stopped waiting.
+    """
+
+    def __init__(self):
+        self._calls: dict[str, Flight] = {}
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        if (flight := self._calls.get(key)) is None:
+            flight = Flight(func)
+            self._start(key, flight)
+        flight.join()
+        try:
+            return await within_deadline(asyncio.shield(flight.task))
+        finally:
+            if flight.leave():
+                self._forget(key, flight)
+
+    async def do_many(
+        self, keys: list[str], func: Callable[[list[str]], Awaitable[list]]
+    ) -> list:
+        """
+        Like `do` for each key, calling `func` once with the keys that aren't in
+        flight yet, for their results in the same order.
+        """
+        if new := [key for key in dict.fromkeys(keys) if key not in self._calls]:
+            batch = Flight(partial(func, new))
+            for i, key in enumerate(new):
+                self._start(key, Flight(partial(self._item, batch, i)))
+        flights = [self._calls[key] for key in keys]
+        for flight in flights:
+            flight.join()
+        try:
+            return await within_deadline(
+                asyncio.gather(*(asyncio.shield(x.task) for x in flights))
+            )
+        finally:
+            for key, flight in zip(keys, flights):
+                if flight.leave():
+                    self._forget(key, flight)
+
+    @staticmethod
+    async def _item(batch: Flight, i: int) -> Any:
+        """
+        Await the result of a key in a call made for several, which is cancelled
+        once none of its keys is awaited anymore.
+        """
+        batch.join()
+        try:
+            return (await within_deadline(asyncio.shield(batch.task)))[i]
+        finally:
+            batch.leave()
+
+    def _start(self, key: str, flight: Flight) -> None:
+        self._calls[key] = flight
+        flight.task.add_done_callback(lambda _: self._forget(key, flight))
+
+    def _forget(self, key: str, flight: Flight) -> None:
+        if self._calls.get(key) is flight:
+            del self._calls[key]
+        # mark the exception as retrieved in case every caller was cancelled
+        if flight.task.done() and not flight.task.cancelled():
+            flight.task.exception()
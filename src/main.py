@@ -1,3 +1,4 @@
+import asyncio
 import logging
 
 import aioredis
@@ -6,10 +7,17 @@ from elasticsearch import AsyncElasticsearch
 from fastapi import FastAPI
 from fastapi.responses import ORJSONResponse
 
+from api import admin
+from api.middleware import deadline_exceeded_handler, request_context_middleware
 from api.v1 import films, genres, persons
 from core.config import config
+from core.context import DeadlineExceeded
 from core.logger import LOGGING
-from db import cache, elastic
+from db import cache, elastic, generations, pools, popularity
+from db.batching import BatchingElasticAdapter
+from db.codecs import make_codec
+from db.hedging import HedgingElasticAdapter
+from services.warmup import warm_up_cache
 
 app = FastAPI(
     title=config.PROJECT_NAME,
@@ -19,17 +27,87 @@ app = FastAPI(
     default_response_class=ORJSONResponse,
 )
 
+app.middleware("http")(request_context_middleware)
+app.exception_handler(DeadlineExceeded)(deadline_exceeded_handler)
+
+# tasks running for the lifetime of the app
+background_tasks: set[asyncio.Task] = set()
+
 
 @app.on_event("startup")
 async def startup():
-    cache.redis_client = aioredis.from_url(
-        f"{config.REDIS_PATH}", encoding="utf-8", decode_responses=True
+    # cache values are binary, see db.codecs
+    cache.redis_client = aioredis.Redis(
+        connection_pool=pools.MeteredConnectionPool.from_url(
+            config.REDIS_PATH,
+            max_connections=config.REDIS_POOL_SIZE,
+            timeout=config.REDIS_POOL_TIMEOUT,
+            socket_connect_timeout=config.REDIS_CONNECT_TIMEOUT,
+            socket_timeout=config.REDIS_SOCKET_TIMEOUT,
+            socket_keepalive=config.REDIS_SOCKET_KEEPALIVE,
+            retry_on_timeout=config.REDIS_RETRY_ON_TIMEOUT,
+            health_check_interval=config.REDIS_HEALTH_CHECK_INTERVAL,
+        )
+    )
+    cache.cache_codec = make_codec(
+        config.CACHE_CODEC, config.CACHE_COMPRESSION, config.CACHE_COMPRESSION_THRESHOLD
+    )
+    cache.min_budget = config.CACHE_MIN_BUDGET
+    elastic.elastic_client = AsyncElasticsearch(
+        hosts=[config.ELASTIC_PATH],
+        connection_class=pools.MeteredAIOHttpConnection,
+        maxsize=config.ELASTIC_POOL_SIZE,
+        keepalive_timeout=config.ELASTIC_KEEPALIVE,
+        timeout=config.ELASTIC_TIMEOUT,
+        max_retries=config.ELASTIC_MAX_RETRIES,
+        retry_on_timeout=config.ELASTIC_RETRY_ON_TIMEOUT,
+        http_compress=config.ELASTIC_HTTP_COMPRESS,
+    )
+    await pools.open_connections(
+        cache.redis_client,
+        elastic.elastic_client,
+        config.REDIS_POOL_WARMUP,
+        config.ELASTIC_POOL_WARMUP,
+    )
+    if config.ELASTIC_BATCHING_ENABLED and config.ELASTIC_HEDGING_ENABLED:
+        raise RuntimeError("Elasticsearch batching and hedging can't be combined")
+    if config.ELASTIC_BATCHING_ENABLED:
+        elastic.elastic_adapter = BatchingElasticAdapter(
+            elastic.elastic_client,
+            max_size=config.ELASTIC_BATCH_MAX_SIZE,
+            max_latency=config.ELASTIC_BATCH_MAX_LATENCY,
+        )
+    if config.ELASTIC_HEDGING_ENABLED:
+        elastic.elastic_adapter = HedgingElasticAdapter(
+            elastic.elastic_client,
+            percentile=config.ELASTIC_HEDGE_PERCENTILE,
+            initial_delay=config.ELASTIC_HEDGE_INITIAL_DELAY,
+            min_delay=config.ELASTIC_HEDGE_MIN_DELAY,
+        )
+    generations.index_generations = generations.IndexGenerations(
+        cache.redis_client, config.CACHE_KEY_PREFIX, config.CACHE_GENERATION_EXPIRE
+    )
+    popularity.popularity = popularity.Popularity(
+        cache.redis_client, config.CACHE_KEY_PREFIX, config.POPULARITY_MAX_SIZE
+    )
+    background_tasks.add(
+        asyncio.create_task(popularity.popularity.run(config.POPULARITY_FLUSH_INTERVAL))
     )
-    elastic.elastic_client = AsyncElasticsearch(hosts=[config.ELASTIC_PATH])
+    if config.LOCAL_CACHE_ENABLED:
+        cache.local_cache = cache.LocalCache(
+            max_entries=config.LOCAL_CACHE_MAX_ENTRIES,
+            max_bytes=config.LOCAL_CACHE_MAX_BYTES,
+            ttl=config.LOCAL_CACHE_EXPIRE,
+        )
+    if config.CACHE_WARMUP_ENABLED:
+        await warm_up_cache()
 
 
 @app.on_event("shutdown")
 async def shutdown():
+    for task in background_tasks:
+        task.cancel()
+    await popularity.popularity.flush()
     await cache.redis_client.close()
     await elastic.elastic_client.close()
 
@@ -37,6 +115,7 @@ async def shutdown():
 app.include_router(films.router, prefix="/api/v1/films", tags=["films"])
 app.include_router(genres.router, prefix="/api/v1/genres", tags=["genres"])
 app.include_router(persons.router, prefix="/api/v1/persons", tags=["persons"])
+app.include_router(admin.router, prefix="/api/admin", tags=["admin"])
 
 
 if __name__ == "__main__":
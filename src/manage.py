@@ -0,0 +1,40 @@
+"""
+Maintenance commands, run from the `src` directory:
+
+    python manage.py invalidate movies persons
+"""
+import argparse
+import asyncio
+
+import aioredis
+
+from core.config import config
+from db.elastic import ElasticIndexes
+from db.generations import IndexGenerations
+
+
+async def invalidate(indexes: list[ElasticIndexes]) -> None:
+    """
+    Invalidate everything cached from the indexes by bumping their generations.
+    """
+    redis = aioredis.from_url(config.REDIS_PATH)
+    try:
+        generations = IndexGenerations(
+            redis, config.CACHE_KEY_PREFIX, config.CACHE_GENERATION_EXPIRE
+        )
+        for index in indexes:
+            print(f"{index.value}: generation {await generations.bump(index)}")
+    finally:
+        await redis.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    commands = parser.add_subparsers(dest="command", required=True)
+    invalidate_parser = commands.add_parser(
+        "invalidate", help="invalidate the cache of Elasticsearch indexes"
+    )
+    invalidate_parser.add_argument("indexes", nargs="+", type=ElasticIndexes)
+    args = parser.parse_args()
+    if args.command == "invalidate":
+        asyncio.run(invalidate(args.indexes))
@@ -1,7 +1,8 @@
-from typing import Any, Callable
+from functools import lru_cache
+from typing import Any, Callable, Type, TypeVar, get_type_hints
 
 import orjson
-from pydantic import BaseModel
+from pydantic import BaseModel, create_model
 
 
 def orjson_dumps(v: Any, *, default: Callable[[Any], Any] | None) -> str:
@@ -16,3 +17,25 @@ class OrJsonMixin:
 
 class BaseDBModel(BaseModel, OrJsonMixin):
     pass
+
+
+ModelType = TypeVar("ModelType", bound=BaseModel)
+
+
+@lru_cache()
+def projection(model: Type[ModelType], fields: tuple[str, ...]) -> Type[ModelType]:
+    """
+    A model with only the `fields` of `model`, for documents fetched with just
+    those fields. It derives from the base class of `model`, since deriving from
+    `model` itself would bring all of its fields along.
+    """
+    hints = get_type_hints(model)
+    return create_model(
+        f"{model.__name__}Projection",
+        __base__=model.__base__,
+        **{
+            name: (hints[name], field.field_info)
+            for name, field in model.__fields__.items()
+            if name in fields
+        },
+    )
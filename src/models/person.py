@@ -4,6 +4,9 @@ from pydantic import Field
 
 from models.base import BaseDBModel
 
+# fields of a person listing the films they took part in
+ROLES = ("actor", "writer", "director")
+
 
 class FilmShort(BaseDBModel):
     id: UUID
@@ -11,6 +14,10 @@ class FilmShort(BaseDBModel):
     imdb_rating: float | None = None
 
 
+class FilmId(BaseDBModel):
+    id: UUID
+
+
 class Person(BaseDBModel):
     id: UUID
     name: str = Field(alias="full_name")
@@ -23,3 +30,16 @@ class PersonsFilms(BaseDBModel):
     actor: list[FilmShort]
     writer: list[FilmShort]
     director: list[FilmShort]
+
+
+class PersonFilmIds(BaseDBModel):
+    """
+    A person with just the ids of their films, for reading only the fields of a
+    person that are responded with.
+    """
+
+    id: UUID
+    name: str = Field(alias="full_name")
+    actor: list[FilmId] = []
+    writer: list[FilmId] = []
+    director: list[FilmId] = []
@@ -1,5 +1,97 @@
+import time
+from collections import deque
+from dataclasses import dataclass
+
 from elasticsearch_dsl import Search
 
+from core.config import config
+from db.elastic import CachePolicy, ElasticIndexes
+from db.keys import CacheKeyBuilder
+
+cache_keys = CacheKeyBuilder(
+    prefix=config.CACHE_KEY_PREFIX,
+    versions={
+        ElasticIndexes.MOVIES: config.FILMS_CACHE_VERSION,
+        ElasticIndexes.GENRES: config.GENRES_CACHE_VERSION,
+        ElasticIndexes.PERSONS: config.PERSONS_CACHE_VERSION,
+        "responses": config.RESPONSES_CACHE_VERSION,
+    },
+)
+
 
 def paginate(search: Search, page_number: int, page_size: int) -> Search:
     return search[(page_number - 1) * page_size : page_number * page_size]
+
+
+@dataclass
+class Cursor:
+    """
+    Position of a cursor paginated search: the sort values of the last hit read
+    and the point in time the pages are read from.
+    """
+
+    search_after: list
+    pit_id: str | None = None
+
+
+class InvalidCursor(Exception):
+    """
+    The cursor doesn't point into the search, e.g. it was made for another sort.
+    """
+
+
+class CursorExpired(Exception):
+    """
+    The point in time of the cursor was closed or not kept alive between pages.
+    """
+
+
+# monotonic times this worker opened points in time at, within the last minute
+pit_opens: deque[float] = deque()
+
+
+def may_open_pit() -> bool:
+    """
+    Count a point in time to open unless the worker opened its share this minute.
+    """
+    now = time.monotonic()
+    while pit_opens and pit_opens[0] <= now - 60:
+        pit_opens.popleft()
+    if len(pit_opens) >= config.SCROLL_MAX_PITS_PER_MINUTE:
+        return False
+    pit_opens.append(now)
+    return True
+
+
+def search_after(
+    search: Search, sort: list[str], cursor: Cursor | None, page_size: int
+) -> Search:
+    """
+    Page the search from the cursor on, reading a page costs the same at any depth.
+    Sorted by the `sort` fields then by `id`, so that hits sorting equally are
+    paged in a fixed order.
+    """
+    search = search.sort(*sort, "id").extra(track_total_hits=False)
+    if cursor and cursor.search_after:
+        search = search.extra(search_after=cursor.search_after)
+    if cursor and cursor.pit_id:
+        search = search.extra(
+            pit={"id": cursor.pit_id, "keep_alive": config.SCROLL_PIT_KEEP_ALIVE}
+        )
+        # searches under a point in time name no index
+        search = search.index()
+    return search[:page_size]
+
+
+def cache_policy(ttl: int) -> CachePolicy:
+    return CachePolicy(
+        ttl=ttl,
+        negative_ttl=config.CACHE_NEGATIVE_EXPIRE,
+        jitter=config.CACHE_EXPIRE_JITTER,
+        lock_ttl=config.CACHE_LOCK_EXPIRE,
+        lock_wait=config.CACHE_LOCK_WAIT,
+        lock_poll_interval=config.CACHE_LOCK_POLL_INTERVAL,
+        early_refresh_beta=config.CACHE_EARLY_REFRESH_BETA,
+        stale_ttl=config.CACHE_STALE_EXPIRE,
+        stale_deadline=config.CACHE_STALE_DEADLINE,
+    )
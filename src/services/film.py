@@ -1,6 +1,9 @@
+from enum import Enum
 from functools import lru_cache
+from typing import Type
 from uuid import UUID
 
+from elasticsearch import NotFoundError, RequestError
 from elasticsearch_dsl import Q, Search
 from fastapi import Depends
 
@@ -12,18 +15,74 @@ from db.elastic import (
     ElasticIndexes,
     get_elastic,
 )
+from db.generations import IndexGenerations, get_generations
+from models.base import BaseDBModel, projection
 from models.film import Film
-from services.base import paginate
+from services.base import (
+    Cursor,
+    CursorExpired,
+    InvalidCursor,
+    cache_keys,
+    cache_policy,
+    may_open_pit,
+    paginate,
+    search_after,
+)
+
+
+class SortFilmsOptions(str, Enum):
+    RATING_DESC = "-imdb_rating"
+    RATING_ASC = "imdb_rating"
 
 
 class FilmService:
-    def __init__(self, cache: CacheAdapterProtocol, elastic: ElasticAdapterProtocol):
-        self.elastic = CachedElasticDecorator(elastic, cache, config.FILMS_CACHE_EXPIRE)
+    def __init__(
+        self,
+        cache: CacheAdapterProtocol,
+        elastic: ElasticAdapterProtocol,
+        generations: IndexGenerations | None,
+    ):
+        self.elastic = CachedElasticDecorator(
+            elastic,
+            cache,
+            cache_policy(config.FILMS_CACHE_EXPIRE),
+            cache_keys,
+            generations,
+        )
 
-    async def retrieve(self, film_id: UUID) -> Film | None:
-        if film := await self.elastic.get(index=ElasticIndexes.MOVIES, id=film_id):
-            return Film(**film)
-        return None
+    async def retrieve(
+        self, film_id: UUID, fields: list[str] | None = None
+    ) -> BaseDBModel | None:
+        """
+        Given `fields`, only those fields of the film and its id are fetched and it
+        is returned as a projection of `Film`.
+        """
+        if fields:
+            fields = _with_id(fields)
+        film = await self.elastic.get(
+            index=ElasticIndexes.MOVIES, id=film_id, fields=fields and list(fields)
+        )
+        if not film:
+            return None
+        if fields:
+            return projection(Film, fields)(**film)
+        return Film(**film)
+
+    async def retrieve_many(
+        self, film_ids: list[UUID], fields: list[str] | None = None
+    ) -> list[BaseDBModel | None]:
+        """
+        Get films in the order of `film_ids`, None for the ones not found. Given
+        `fields`, they are fetched and returned like with `retrieve`.
+        """
+        model = Film
+        if fields:
+            fields = _with_id(fields)
+            model = projection(Film, fields)
+        docs = await self.elastic.get_many(
+            ElasticIndexes.MOVIES, film_ids, fields and list(fields)
+        )
+        return [model(**doc) if doc else None for doc in docs]
 
     async def search(
         self,
@@ -32,8 +91,84 @@ class FilmService:
         genre_id: UUID | None,
         page_number: int,
         page_size: int,
-    ) -> tuple[list[Film], int]:
+        fields: list[str] | None = None,
+    ) -> tuple[list[BaseDBModel], int]:
+        """
+        Given `fields`, only those fields of the films and their ids are fetched and
+        the films are returned as a projection of `Film` with those fields.
+        """
+        search, model = self._search(query_string, sort_field, genre_id, fields)
+        search = paginate(search, page_number, page_size)
+
+        results = await self.elastic.search(search)
+
+        return (
+            [model(**item) for item in results.docs],
+            results.num_hits,
+        )
+
+    async def scroll(
+        self,
+        sort_field: str | None,
+        genre_id: UUID | None,
+        cursor: Cursor | None,
+        page_size: int,
+        fields: list[str] | None = None,
+    ) -> tuple[list[BaseDBModel], Cursor | None]:
+        """
+        Get the page of films after the cursor, and the cursor of the next page, or
+        None if it is the last one.
+
+        The first page opens a point in time, if enabled and the worker hasn't
+        opened too many lately, that the following pages are read from and that is
+        closed once the last page is read.
+
+        Raises `InvalidCursor` for a cursor Elasticsearch rejects and
+        `CursorExpired` once its point in time is gone.
+        """
+        position = cursor
+        if cursor is None and config.SCROLL_PIT_KEEP_ALIVE and may_open_pit():
+            pit_id = await self.elastic.open_point_in_time(
+                ElasticIndexes.MOVIES, config.SCROLL_PIT_KEEP_ALIVE
+            )
+            cursor = Cursor(search_after=[], pit_id=pit_id)
+        search, model = self._search(None, sort_field, genre_id, fields)
+        search = search_after(
+            search, [sort_field] if sort_field else [], cursor, page_size
+        )
+
+        try:
+            results = await self.elastic.search(search)
+        except NotFoundError:
+            if position is None or position.pit_id is None:
+                raise
+            raise CursorExpired()
+        except RequestError:
+            if position is None:
+                raise
+            raise InvalidCursor()
+
+        pit_id = results.pit_id or (cursor and cursor.pit_id)
+        next_cursor = None
+        if len(results.hits) == page_size:
+            next_cursor = Cursor(search_after=results.hits[-1]["sort"], pit_id=pit_id)
+        elif pit_id:
+            await self.elastic.close_point_in_time(pit_id)
+        return [model(**item) for item in results.docs], next_cursor
+
+    def _search(
+        self,
+        query_string: str | None,
+        sort_field: str | None,
+        genre_id: UUID | None,
+        fields: list[str] | None,
+    ) -> tuple[Search, Type[BaseDBModel]]:
         search = Search(index=ElasticIndexes.MOVIES)
+        model = Film
+        if fields:
+            fields = _with_id(fields)
+            search = search.source(includes=list(fields))
+            model = projection(Film, fields)
         search.query = Q("bool")
 
         if sort_field:
@@ -61,19 +196,21 @@ class FilmService:
                     fuzziness=2,
                 )
             ]
-        search = paginate(search, page_number, page_size)
+        return search, model
 
-        results = await self.elastic.search(search)
 
-        return (
-            [Film(**item) for item in results.docs],
-            results.num_hits,
-        )
+def _with_id(fields: list[str]) -> tuple[str, ...]:
+    """
+    The fields to fetch, with the id, which identifies a film even when it isn't
+    responded with.
+    """
+    return tuple(sorted({*fields, "id"}))
 
 
 @lru_cache()
 def get_film_service(
     cache: CacheAdapterProtocol = Depends(get_cache),
     elastic: ElasticAdapterProtocol = Depends(get_elastic),
+    generations: IndexGenerations | None = Depends(get_generations),
 ) -> FilmService:
-    return FilmService(cache, elastic)
+    return FilmService(cache, elastic, generations)
@@ -12,12 +12,25 @@ from db.elastic import (
     ElasticIndexes,
     get_elastic,
 )
+from db.generations import IndexGenerations, get_generations
 from models.genre import Genre
+from services.base import cache_keys, cache_policy
 
 
 class GenreService:
-    def __init__(self, cache: CacheAdapterProtocol, elastic: ElasticAdapterProtocol):
-        self.elastic = CachedElasticDecorator(elastic, cache, config.FILMS_CACHE_EXPIRE)
+    def __init__(
+        self,
+        cache: CacheAdapterProtocol,
+        elastic: ElasticAdapterProtocol,
+        generations: IndexGenerations | None,
+    ):
+        self.elastic = CachedElasticDecorator(
+            elastic,
+            cache,
+            cache_policy(config.GENRES_CACHE_EXPIRE),
+            cache_keys,
+            generations,
+        )
 
     async def list(self) -> list[Genre]:
         search = Search(index=ElasticIndexes.GENRES)
@@ -31,10 +44,16 @@ class GenreService:
             return Genre(**doc)
         return None
 
+    # annotations are quoted, `list` being the method above within the class
+    async def retrieve_many(self, genre_ids: "list[UUID]") -> "list[Genre | None]":
+        docs = await self.elastic.get_many(ElasticIndexes.GENRES, genre_ids)
+        return [Genre(**doc) if doc else None for doc in docs]
+
 
 @lru_cache()
 def get_genre_service(
     cache: CacheAdapterProtocol = Depends(get_cache),
     elastic: ElasticAdapterProtocol = Depends(get_elastic),
+    generations: IndexGenerations | None = Depends(get_generations),
 ) -> GenreService:
-    return GenreService(cache, elastic)
+    return GenreService(cache, elastic, generations)
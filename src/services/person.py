@@ -1,8 +1,9 @@
+from enum import Enum
 from functools import lru_cache
+from typing import Type
 from uuid import UUID
 
 from elasticsearch_dsl import Q, Search
-from elasticsearch_dsl.query import Terms
 from fastapi import Depends
 
 from core.config import config
@@ -13,63 +14,160 @@ from db.elastic import (
     ElasticIndexes,
     get_elastic,
 )
-from models.film import Film
-from models.person import FilmShort, Person, PersonsFilms
-from services.base import paginate
+from db.generations import IndexGenerations, get_generations
+from models.base import BaseDBModel, projection
+from models.person import ROLES, FilmShort, Person, PersonFilmIds, PersonsFilms
+from services.base import cache_keys, cache_policy, paginate
+
+
+class PersonsFilmsSource(str, Enum):
+    PERSON = "person"
+    MOVIES = "movies"
 
 
 class PersonService:
-    def __init__(self, cache: CacheAdapterProtocol, elastic: ElasticAdapterProtocol):
-        self.elastic = CachedElasticDecorator(elastic, cache, config.FILMS_CACHE_EXPIRE)
+    def __init__(
+        self,
+        cache: CacheAdapterProtocol,
+        elastic: ElasticAdapterProtocol,
+        generations: IndexGenerations | None,
+    ):
+        self.elastic = CachedElasticDecorator(
+            elastic,
+            cache,
+            cache_policy(config.PERSONS_CACHE_EXPIRE),
+            cache_keys,
+            generations,
+        )
+        # films are cached for as long as the films service caches them, under
+        # the same keys
+        self.films = CachedElasticDecorator(
+            elastic,
+            cache,
+            cache_policy(config.FILMS_CACHE_EXPIRE),
+            cache_keys,
+            generations,
+        )
 
-    async def retrieve(self, id: UUID) -> Person | None:
-        if not (person := await self.elastic.get(index=ElasticIndexes.PERSONS, id=id)):
+    async def retrieve(
+        self, id: UUID, fields: list[str] | None = None
+    ) -> BaseDBModel | None:
+        """
+        Given `fields`, only those fields of the person and its id are fetched, its
+        films by their ids alone, and it is returned as a projection of
+        `PersonFilmIds`.
+        """
+        model, source = _projection(fields)
+        if not (
+            person := await self.elastic.get(
+                index=ElasticIndexes.PERSONS, id=id, fields=source
+            )
+        ):
             return None
-        person = Person(**person)
-        return person
+        return model(**person)
+
+    async def retrieve_many(
+        self, person_ids: list[UUID], fields: list[str] | None = None
+    ) -> list[BaseDBModel | None]:
+        model, source = _projection(fields)
+        docs = await self.elastic.get_many(ElasticIndexes.PERSONS, person_ids, source)
+        return [model(**doc) if doc else None for doc in docs]
 
     async def search(
-        self, query_string: str, page_number: int, page_size: int
-    ) -> tuple[list[Person], int]:
+        self,
+        query_string: str,
+        page_number: int,
+        page_size: int,
+        fields: list[str] | None = None,
+    ) -> tuple[list[BaseDBModel], int]:
+        model, source = _projection(fields)
         search = Search(index=ElasticIndexes.PERSONS)
         search.query = Q("match", full_name={"query": query_string, "fuzziness": 2})
+        if source:
+            search = search.source(includes=source)
         search = paginate(search, page_number, page_size)
 
         results = await self.elastic.search(search)
 
         return (
-            [Person(**doc) for doc in results.docs],
+            [model(**doc) for doc in results.docs],
             results.num_hits,
         )
 
-    async def list_movies(self, person_id: UUID) -> PersonsFilms | None:
-        if not (person := await self.retrieve(person_id)):
+    async def list_movies(
+        self, person_id: UUID, source: PersonsFilmsSource | None = None
+    ) -> PersonsFilms | None:
+        """
+        With the person source, films embedded in the person document are used as
+        they are and only the ones missing a field are got from the movies index.
+        """
+        source = source or PersonsFilmsSource(config.PERSONS_FILMS_SOURCE)
+        if not (
+            doc := await self.elastic.get(index=ElasticIndexes.PERSONS, id=person_id)
+        ):
             return None
-        actor_film_ids = [film.id for film in person.actor]
-        writer_film_ids = [film.id for film in person.writer]
-        director_film_ids = [film.id for film in person.director]
+        person = Person(**doc)
 
-        search = Search(index=ElasticIndexes.MOVIES)
-        search.query = Terms(id=actor_film_ids + writer_film_ids + director_film_ids)
-        search = search[0:10000]
+        film_id_2_film = {}
+        if source == PersonsFilmsSource.PERSON:
+            # embedded films indexed before a field was added to them lack it
+            complete = (
+                FilmShort(**film)
+                for role in ROLES
+                for film in doc.get(role, [])
+                if film.keys() >= FilmShort.__fields__.keys()
+            )
+            film_id_2_film = {film.id: film for film in complete}
 
-        results = await self.elastic.search(search)
+        film_ids = [
+            id
+            for id in dict.fromkeys(
+                film.id for film in person.actor + person.writer + person.director
+            )
+            if id not in film_id_2_film
+        ]
+        if film_ids:
+            docs = await self.films.get_many(
+                ElasticIndexes.MOVIES, film_ids, fields=list(FilmShort.__fields__)
+            )
+            film_id_2_film |= {
+                id: FilmShort(**doc)
+                for id, doc in zip(film_ids, docs)
+                if doc is not None
+            }
 
-        films = [Film(**doc) for doc in results.docs]
-        film_id_2_film = {film.id: film for film in films}
+        def films(roles: list[FilmShort]) -> list[FilmShort]:
+            return [film_id_2_film[x.id] for x in roles if x.id in film_id_2_film]
 
         return PersonsFilms(
-            actor=[FilmShort(**film_id_2_film[id].dict()) for id in actor_film_ids],
-            writer=[FilmShort(**film_id_2_film[id].dict()) for id in writer_film_ids],
-            director=[
-                FilmShort(**film_id_2_film[id].dict()) for id in director_film_ids
-            ],
+            actor=films(person.actor),
+            writer=films(person.writer),
+            director=films(person.director),
         )
 
 
+def _projection(
+    fields: list[str] | None,
+) -> tuple[Type[BaseDBModel], list[str] | None]:
+    """
+    The model of a person fetched with the given fields, and the fields of its
+    document to fetch, None for all of them: the id is always fetched and films
+    are fetched by their ids alone, e.g. `actor` is `actor.id`.
+    """
+    if not fields:
+        return Person, None
+    fields = tuple(sorted({*fields, "id"}))
+    source = [
+        PersonFilmIds.__fields__[x].alias if x not in ROLES else f"{x}.id"
+        for x in fields
+    ]
+    return projection(PersonFilmIds, fields), sorted(source)
+
+
 @lru_cache()
 def get_person_service(
     cache: CacheAdapterProtocol = Depends(get_cache),
     elastic: ElasticAdapterProtocol = Depends(get_elastic),
+    generations: IndexGenerations | None = Depends(get_generations),
 ) -> PersonService:
-    return PersonService(cache, elastic)
+    return PersonService(cache, elastic, generations)
@@ -0,0 +1,89 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable
+
+from core.config import config
+from core.context import request_context
+from db.cache import CacheAdapterProtocol, get_cache
+from db.elastic import ElasticAdapterProtocol, ElasticIndexes, get_elastic
+from db.generations import IndexGenerations, get_generations
+from db.popularity import Popularity, get_popularity
+from models.person import FilmShort
+from services.film import FilmService, SortFilmsOptions
+from services.genre import GenreService
+
+logger = logging.getLogger(__name__)
+
+
+async def warm_up(
+    cache: CacheAdapterProtocol,
+    elastic: ElasticAdapterProtocol,
+    generations: IndexGenerations | None,
+    popularity: Popularity | None,
+) -> int:
+    """
+    Preload the hot keys into the cache: the genre list, the first pages of the film
+    list for each sort order and genre, and the most requested films.
+
+    Returns the number of queries made, at most `CACHE_WARMUP_CONCURRENCY` at a time.
+    """
+    film_service = FilmService(cache, elastic, generations)
+    genre_service = GenreService(cache, elastic, generations)
+    semaphore = asyncio.Semaphore(config.CACHE_WARMUP_CONCURRENCY)
+
+    async def bounded(query: Awaitable) -> None:
+        async with semaphore:
+            await query
+
+    genres = await genre_service.list()
+    queries = [
+        film_service.search(
+            None,
+            sort,
+            genre_id,
+            page,
+            config.CACHE_WARMUP_PAGE_SIZE,
+            # the fields the film list responds with
+            fields=list(FilmShort.__fields__),
+        )
+        for sort in SortFilmsOptions
+        for genre_id in [None, *(genre.id for genre in genres)]
+        for page in range(1, config.CACHE_WARMUP_FILMS_PAGES + 1)
+    ]
+    if popularity and config.CACHE_WARMUP_TOP_FILMS:
+        film_ids = await popularity.top(
+            ElasticIndexes.MOVIES, config.CACHE_WARMUP_TOP_FILMS
+        )
+        queries.append(film_service.retrieve_many(film_ids))
+    await asyncio.gather(*map(bounded, queries))
+    return len(queries) + 1
+
+
+async def warm_up_cache() -> None:
+    """
+    Warm the cache up with the process's clients, giving up after
+    `CACHE_WARMUP_TIMEOUT` seconds. Failures are logged, not raised, since a cold
+    cache only makes the first requests slower.
+    """
+    # run after an invalidation request, free of that request's deadline
+    request_context.set(None)
+    started_at = time.monotonic()
+    try:
+        num_queries = await asyncio.wait_for(
+            warm_up(
+                await get_cache(),
+                await get_elastic(),
+                await get_generations(),
+                await get_popularity(),
+            ),
+            timeout=config.CACHE_WARMUP_TIMEOUT,
+        )
+    except Exception:
+        logger.exception("cache warm-up failed")
+        return
+    logger.info(
+        "cache warmed up with %s queries in %.2fs",
+        num_queries,
+        time.monotonic() - started_at,
+    )
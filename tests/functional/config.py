@@ -9,6 +9,9 @@ class Config(BaseSettings):
     APP_PATH: str = "http://localhost:80"
     REDIS_PATH: str = "redis://localhost:6379/0"
     ELASTIC_PATH: str = "http://localhost:9200"
+    # the app itself, serving the admin API, and the token of its test config
+    ADMIN_PATH: str = "http://localhost:5000"
+    ADMIN_TOKEN: str = "test-admin-token"
 
     ELASIC_INDEX_NAME_MOVIES: str = "movies"
     ELASIC_INDEX_NAME_PERSONS: str = "persons"
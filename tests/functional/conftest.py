@@ -1,6 +1,10 @@
 import asyncio
+import json
+import time
 from contextlib import suppress
 from dataclasses import dataclass
+from http import HTTPStatus
+from typing import Mapping
 
 import aiohttp
 import elasticsearch
@@ -43,33 +47,64 @@ async def session():
 
 @dataclass
 class Response:
-    body: dict
+    body: dict | None
     status: int
+    headers: Mapping[str, str]
+
+
+class Client:
+    def __init__(
+        self,
+        session: aiohttp.ClientSession,
+        path: str,
+        headers: Mapping[str, str] | None = None,
+    ):
+        self.session = session
+        self.path = path
+        self.headers = headers or {}
+
+    async def _make_request(self, method: str, path: str, **kwargs):
+        path = self.path + path
+        kwargs["headers"] = {**self.headers, **kwargs.get("headers", {})}
+        async with getattr(self.session, method)(path, **kwargs) as response:
+            return Response(
+                body=(
+                    await response.json()
+                    if response.status != HTTPStatus.NOT_MODIFIED
+                    else None
+                ),
+                status=response.status,
+                headers=response.headers,
+            )
 
+    async def get(self, path, **kwargs):
+        return await self._make_request("get", path, **kwargs)
 
-@pytest.fixture(scope="session")
-async def client(session):
-    class Client:
-        path = config.APP_PATH + "/api/v1"
+    async def post(self, path, **kwargs):
+        return await self._make_request("post", path, **kwargs)
 
-        async def _make_request(self, method: str, path: str, **kwargs):
-            path = self.path + path
-            async with getattr(session, method)(path, **kwargs) as response:
-                return Response(body=await response.json(), status=response.status)
+    async def put(self, path, **kwargs):
+        return await self._make_request("put", path, **kwargs)
 
-        async def get(self, path, **kwargs):
-            return await self._make_request("get", path, **kwargs)
+    async def patch(self, path, **kwargs):
+        return await self._make_request("patch", path, **kwargs)
 
-        async def post(self, path, **kwargs):
-            return await self._make_request("post", path, **kwargs)
 
-        async def put(self, path, **kwargs):
-            return await self._make_request("put", path, **kwargs)
+@pytest.fixture(scope="session")
+async def client(session):
+    return Client(session, config.APP_PATH + "/api/v1")
 
-        async def patch(self, path, **kwargs):
-            return await self._make_request("patch", path, **kwargs)
 
-    return Client()
+@pytest.fixture(scope="session")
+async def admin_client(session):
+    """
+    Client of the admin API, served by the app itself since nginx hides it.
+    """
+    return Client(
+        session,
+        config.ADMIN_PATH + "/api/admin",
+        {"Authorization": f"Bearer {config.ADMIN_TOKEN}"},
+    )
 
 
 @pytest.fixture
@@ -97,6 +132,57 @@ async def clear_index(elastic_client: AsyncElasticsearch, index_name: str) -> No
         await elastic_client.indices.delete(index=index_name)
 
 
+async def expire_cache(redis_client) -> None:
+    """
+    Expire the cached Elasticsearch responses, as if their TTL passed, keeping them
+    to be served stale, and drop the responses rendered from them.
+    """
+    await drop_responses(redis_client)
+    await update_entries(redis_client, expires_at=time.time() - 1)
+
+
+async def update_entries(redis_client, **fields) -> None:
+    """
+    Overwrite fields of the cached Elasticsearch responses' entries, see the app's
+    CacheEntry.
+    """
+    async for key in redis_client.scan_iter():
+        if ":responses:" in key or key.startswith("lock:"):
+            continue
+        value = await redis_client.get(key)
+        # entries are JSON after a header byte, see the app's CacheCodec
+        if not value or value[0] != "\x01":
+            continue
+        entry = json.loads(value[1:])
+        if isinstance(entry, dict) and "expires_at" in entry:
+            entry.update(fields)
+            await redis_client.set(key, "\x01" + json.dumps(entry), keepttl=True)
+
+
+async def cached_keys(redis_client, namespace: str) -> list[str]:
+    """
+    Keys of the entries the app cached in a namespace, an index or `responses`.
+    """
+    return [
+        key
+        async for key in redis_client.scan_iter(f"*:{namespace}:v*")
+        if not key.startswith("lock:")
+    ]
+
+
+async def drop_responses(redis_client) -> None:
+    """
+    Drop the rendered responses, so that requests reach the cached queries.
+    """
+    for key in await cached_keys(redis_client, "responses"):
+        await redis_client.delete(key)
+
+
+async def count_gets(elastic_client: AsyncElasticsearch, index_name: str) -> int:
+    stats = await elastic_client.indices.stats(index=index_name, metric="get")
+    return stats["_all"]["total"]["get"]["total"]
+
+
 async def clear_indexes(elastic_client: AsyncElasticsearch) -> None:
     await asyncio.gather(
         *[
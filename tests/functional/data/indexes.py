@@ -124,6 +124,7 @@ ES_PERSONS_SCHEMA = {
                 "properties": {
                     "id": {"type": "keyword"},
                     "title": {"type": "text", "analyzer": "ru_en"},
+                    "imdb_rating": {"type": "float"},
                 },
             },
             "director": {
@@ -132,6 +133,7 @@ ES_PERSONS_SCHEMA = {
                 "properties": {
                     "id": {"type": "keyword"},
                     "title": {"type": "text", "analyzer": "ru_en"},
+                    "imdb_rating": {"type": "float"},
                 },
             },
             "writer": {
@@ -140,6 +142,7 @@ ES_PERSONS_SCHEMA = {
                 "properties": {
                     "id": {"type": "keyword"},
                     "title": {"type": "text", "analyzer": "ru_en"},
+                    "imdb_rating": {"type": "float"},
                 },
             },
         },
@@ -21,6 +21,7 @@ class Genre(BaseModel):
 class FilmShort(BaseModel):
     id: UUID = field(default_factory=uuid.uuid4)
     title: str
+    imdb_rating: float | None = None
 
 
 @dataclass(kw_only=True)
@@ -57,11 +58,17 @@ class Film(BaseModel):
         self.genres_names = [x.name for x in self.genres]
 
         for person in self.actors:
-            person.actor.append(FilmShort(id=self.id, title=self.title))
+            person.actor.append(
+                FilmShort(id=self.id, title=self.title, imdb_rating=self.imdb_rating)
+            )
         for person in self.writers:
-            person.writer.append(FilmShort(id=self.id, title=self.title))
+            person.writer.append(
+                FilmShort(id=self.id, title=self.title, imdb_rating=self.imdb_rating)
+            )
         for person in self.directors:
-            person.director.append(FilmShort(id=self.id, title=self.title))
+            person.director.append(
+                FilmShort(id=self.id, title=self.title, imdb_rating=self.imdb_rating)
+            )
 
         self.actors_names = [x.full_name for x in self.actors]
         self.writers_names = [x.full_name for x in self.writers]
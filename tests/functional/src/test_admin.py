@@ -0,0 +1,112 @@
+import asyncio
+
+import pytest
+from api.admin import authorize
+from config import config
+from conftest import Client, clear_and_populate_index
+from core.config import config as app_config
+from data.data import film_1
+from data.indexes import ES_MOVIES_SCHEMA
+from fastapi import HTTPException
+
+
+class TestPoolStats:
+    """
+    The Elasticsearch connections are metered by a session the app makes in place
+    of the client's, see the app's db.pools, so these break if the client changes.
+    """
+
+    @pytest.mark.asyncio
+    async def test_counts_connections(
+        self, populate_elastic, clear_cache, client, admin_client
+    ):
+        before = (await admin_client.get("/pools/stats")).body
+
+        response = await client.get(f"/films/{film_1.id}")
+
+        assert response.status == 200
+        response = await admin_client.get("/pools/stats")
+        assert response.status == 200
+        stats = response.body
+        for name in ["elastic", "redis"]:
+            assert stats[name]["acquired"] > before[name]["acquired"]
+            assert stats[name]["max_wait_seconds"] >= 0
+        assert stats["elastic"]["pools"]
+        for pool in stats["elastic"]["pools"]:
+            assert pool["size"] > 0
+            assert pool["in_use"] == 0
+        pool = stats["redis"]["pool"]
+        assert 0 <= pool["in_use"] <= pool["open"] <= pool["size"]
+
+
+class TestAuthorize:
+    @pytest.mark.parametrize(
+        "headers",
+        [
+            {},
+            {"Authorization": "Bearer other"},
+            {"Authorization": f"Basic {config.ADMIN_TOKEN}"},
+        ],
+    )
+    @pytest.mark.asyncio
+    async def test_unauthorized(self, session, headers: dict):
+        client = Client(session, config.ADMIN_PATH + "/api/admin")
+
+        response = await client.get("/cache/stats", headers=headers)
+
+        assert response.status == 401
+        assert response.headers["WWW-Authenticate"] == "Bearer"
+
+    @pytest.mark.asyncio
+    async def test_hidden_by_nginx(self, session):
+        client = Client(
+            session,
+            config.APP_PATH + "/api/admin",
+            {"Authorization": f"Bearer {config.ADMIN_TOKEN}"},
+        )
+
+        response = await client.get("/cache/stats")
+
+        assert response.status == 404
+
+    @pytest.mark.asyncio
+    async def test_no_token_configured(self, monkeypatch):
+        monkeypatch.setattr(app_config, "ADMIN_TOKEN", None)
+
+        with pytest.raises(HTTPException) as e:
+            await authorize(f"Bearer {config.ADMIN_TOKEN}")
+
+        assert e.value.status_code == 404
+
+
+class TestInvalidateIndex:
+    @pytest.fixture(autouse=True)
+    async def setup(self, clear_cache, populate_elastic):
+        pass
+
+    @pytest.mark.asyncio
+    async def test_invalidate(self, client, admin_client, elastic_client):
+        assert (await client.get(f"/films/{film_1.id}")).status == 200
+        await clear_and_populate_index(
+            elastic_client, config.ELASIC_INDEX_NAME_MOVIES, ES_MOVIES_SCHEMA, []
+        )
+        assert (await client.get(f"/films/{film_1.id}")).status == 200
+
+        response = await admin_client.post(
+            f"/cache/generations/{config.ELASIC_INDEX_NAME_MOVIES}"
+        )
+
+        assert response.status == 200
+        assert response.body == {
+            "index": config.ELASIC_INDEX_NAME_MOVIES,
+            "generation": 1,
+        }
+        # workers read generations again after CACHE_GENERATION_EXPIRE
+        await asyncio.sleep(1.1)
+        assert (await client.get(f"/films/{film_1.id}")).status == 404
+
+    @pytest.mark.asyncio
+    async def test_unknown_index(self, admin_client):
+        response = await admin_client.post("/cache/generations/unknown")
+
+        assert response.status == 422
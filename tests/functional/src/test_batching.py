@@ -0,0 +1,107 @@
+import asyncio
+from uuid import uuid4
+
+import pytest
+from config import config
+from data.data import film_1, film_2, films
+from db.batching import BatchingElasticAdapter
+from elasticsearch import NotFoundError
+from elasticsearch_dsl import Search
+
+
+class TestBatchingElasticAdapter:
+    """
+    Test the app's BatchingElasticAdapter in-process, against Elasticsearch, see the
+    app's db.batching.
+    """
+
+    @pytest.fixture(autouse=True)
+    async def setup(self, populate_elastic):
+        pass
+
+    @pytest.fixture
+    def adapter(self, elastic_client):
+        return BatchingElasticAdapter(elastic_client, max_size=3, max_latency=0.05)
+
+    @pytest.fixture
+    def requests(self, elastic_client, monkeypatch) -> list[str]:
+        """
+        The Elasticsearch APIs called, in order.
+        """
+        requests = []
+
+        def spy(api: str):
+            method = getattr(elastic_client, api)
+
+            async def inner(*args, **kwargs):
+                requests.append(api)
+                return await method(*args, **kwargs)
+
+            return inner
+
+        for api in ["get", "mget", "search", "msearch"]:
+            monkeypatch.setattr(elastic_client, api, spy(api))
+        return requests
+
+    @pytest.mark.asyncio
+    async def test_get(self, adapter, requests):
+        results = await asyncio.gather(
+            adapter.get(config.ELASIC_INDEX_NAME_MOVIES, film_1.id),
+            adapter.get(config.ELASIC_INDEX_NAME_MOVIES, film_2.id, ["id", "title"]),
+            adapter.get(config.ELASIC_INDEX_NAME_MOVIES, uuid4()),
+        )
+
+        assert requests == ["mget"]
+        assert results[0]["id"] == str(film_1.id)
+        assert results[0]["title"] == film_1.title
+        assert results[1] == {"id": str(film_2.id), "title": film_2.title}
+        assert results[2] is None
+
+    @pytest.mark.asyncio
+    async def test_get_unknown_index(self, adapter, requests):
+        results = await asyncio.gather(
+            adapter.get(config.ELASIC_INDEX_NAME_MOVIES, film_1.id),
+            adapter.get("unknown", film_1.id),
+        )
+
+        assert requests == ["mget"]
+        assert results[0]["id"] == str(film_1.id)
+        assert results[1] is None
+
+    @pytest.mark.asyncio
+    async def test_max_size(self, adapter, requests):
+        results = await asyncio.gather(
+            *[adapter.get(config.ELASIC_INDEX_NAME_MOVIES, x.id) for x in films * 2]
+        )
+
+        assert requests == ["mget", "mget"]
+        assert [x["id"] for x in results] == [str(x.id) for x in films * 2]
+
+    @pytest.mark.asyncio
+    async def test_search(self, adapter, requests):
+        search = Search(index=config.ELASIC_INDEX_NAME_MOVIES)
+
+        found, empty, unknown = await asyncio.gather(
+            adapter.search(search.query("match_all")),
+            adapter.search(search.query("ids", values=[str(uuid4())])),
+            adapter.search(Search(index="unknown")),
+            return_exceptions=True,
+        )
+
+        assert requests == ["msearch"]
+        assert found.num_hits == len(films)
+        assert {x["id"] for x in found.docs} == {str(x.id) for x in films}
+        assert empty.num_hits == 0
+        assert empty.docs == []
+        assert isinstance(unknown, NotFoundError)
+
+    @pytest.mark.asyncio
+    async def test_search_with_params(self, adapter, requests):
+        search = Search(index=config.ELASIC_INDEX_NAME_MOVIES).params(
+            preference="_local"
+        )
+
+        result = await adapter.search(search)
+
+        assert requests == ["search"]
+        assert result.num_hits == len(films)
@@ -1,8 +1,19 @@
+import asyncio
+import time
 from uuid import UUID, uuid4
 
 import pytest
 from config import config
-from conftest import clear_and_populate_index, clear_index, clear_indexes
+from conftest import (
+    cached_keys,
+    clear_and_populate_index,
+    clear_index,
+    clear_indexes,
+    count_gets,
+    drop_responses,
+    expire_cache,
+    update_entries,
+)
 from data.data import film_2
 from data.indexes import ES_MOVIES_SCHEMA
 from data.models import Film, Genre, Person
@@ -328,3 +339,380 @@ class TestRetrieve:
             "writers": [{"id": str(x.id), "name": x.name} for x in film_2.writers],
             "directors": [{"id": str(x.id), "name": x.name} for x in film_2.directors],
         }
+
+
+class TestBulkRetrieve:
+    @pytest.fixture(autouse=True)
+    async def setup(self, clear_cache, populate_elastic):
+        pass
+
+    @pytest.mark.parametrize("test_cache", [False, True])
+    @pytest.mark.asyncio
+    async def test_retrieve(self, client, elastic_client, test_cache: bool):
+        missing_id = uuid4()
+
+        async def _request():
+            return await client.get(
+                "/films/", params={"ids": f"{film_2.id},{missing_id},{film_2.id}"}
+            )
+
+        if test_cache:
+            await _request()
+            await clear_index(elastic_client, config.ELASIC_INDEX_NAME_MOVIES)
+
+        response = await _request()
+
+        film = {
+            "id": str(film_2.id),
+            "title": film_2.title,
+            "imdb_rating": film_2.imdb_rating,
+        }
+        assert response.status == 200
+        assert response.body == {"results": [film, None, film]}
+
+    @pytest.mark.parametrize(
+        "ids", ["", "not-an-id", ",".join(str(uuid4()) for _ in range(101))]
+    )
+    @pytest.mark.asyncio
+    async def test_invalid_ids(self, client, ids: str):
+        response = await client.get("/films/", params={"ids": ids})
+
+        assert response.status == 422
+
+
+class TestNegativeCache:
+    """
+    Test that not found films and empty results are cached, so that a film indexed
+    meanwhile isn't responded with until they expire.
+    """
+
+    film = Film(title="Negative Caching", imdb_rating=5.0)
+
+    @pytest.fixture(autouse=True)
+    async def setup(self, clear_cache, elastic_client):
+        await clear_and_populate_index(
+            elastic_client, config.ELASIC_INDEX_NAME_MOVIES, ES_MOVIES_SCHEMA, []
+        )
+
+    @pytest.mark.parametrize("test_cache", [False, True])
+    @pytest.mark.asyncio
+    async def test_not_found(self, client, elastic_client, test_cache: bool):
+        async def _request():
+            return await client.get(f"/films/{self.film.id}")
+
+        if test_cache:
+            assert (await _request()).status == 404
+        await clear_and_populate_index(
+            elastic_client,
+            config.ELASIC_INDEX_NAME_MOVIES,
+            ES_MOVIES_SCHEMA,
+            [self.film],
+        )
+
+        response = await _request()
+
+        assert response.status == (404 if test_cache else 200)
+
+    @pytest.mark.parametrize("test_cache", [False, True])
+    @pytest.mark.asyncio
+    async def test_empty_search(self, client, elastic_client, test_cache: bool):
+        async def _request():
+            return await client.get("/films/search", params={"query": self.film.title})
+
+        if test_cache:
+            assert (await _request()).body["results"] == []
+        await clear_and_populate_index(
+            elastic_client,
+            config.ELASIC_INDEX_NAME_MOVIES,
+            ES_MOVIES_SCHEMA,
+            [self.film],
+        )
+
+        response = await _request()
+
+        assert response.status == 200
+        assert [x["id"] for x in response.body["results"]] == (
+            [] if test_cache else [str(self.film.id)]
+        )
+
+
+class TestSingleFlight:
+    """
+    Test that a cache miss is filled by a single query, shared by the concurrent
+    requests of a worker, and guarded across workers by a cache lock.
+    """
+
+    @pytest.fixture(autouse=True)
+    async def setup(self, clear_cache, populate_elastic):
+        pass
+
+    @pytest.mark.asyncio
+    async def test_concurrent_misses(self, client, elastic_client):
+        gets = await count_gets(elastic_client, config.ELASIC_INDEX_NAME_MOVIES)
+
+        responses = await asyncio.gather(
+            *[client.get(f"/films/{film_2.id}") for _ in range(10)]
+        )
+
+        assert [x.status for x in responses] == [200] * 10
+        assert {x.body["id"] for x in responses} == {str(film_2.id)}
+        assert (
+            await count_gets(elastic_client, config.ELASIC_INDEX_NAME_MOVIES)
+            == gets + 1
+        )
+
+    @pytest.mark.asyncio
+    async def test_locked_miss(self, client, elastic_client, redis_client):
+        await client.get(f"/films/{film_2.id}")
+        [key] = await cached_keys(redis_client, config.ELASIC_INDEX_NAME_MOVIES)
+        entry = await redis_client.get(key)
+        await redis_client.flushdb()
+        # another worker is filling the key, from an index the film is gone from
+        await redis_client.set(f"lock:{key}", "other", ex=5)
+        await clear_index(elastic_client, config.ELASIC_INDEX_NAME_MOVIES)
+
+        async def fill():
+            await asyncio.sleep(0.3)
+            await redis_client.set(key, entry)
+
+        response, _ = await asyncio.gather(client.get(f"/films/{film_2.id}"), fill())
+
+        assert response.status == 200
+        assert response.body["id"] == str(film_2.id)
+
+    @pytest.mark.asyncio
+    async def test_locked_stale(self, client, elastic_client, redis_client):
+        await client.get(f"/films/{film_2.id}")
+        [key] = await cached_keys(redis_client, config.ELASIC_INDEX_NAME_MOVIES)
+        await expire_cache(redis_client)
+        await redis_client.set(f"lock:{key}", "other", ex=5)
+        gets = await count_gets(elastic_client, config.ELASIC_INDEX_NAME_MOVIES)
+
+        response = await client.get(f"/films/{film_2.id}")
+
+        assert response.status == 200
+        assert response.headers["Warning"] == '110 - "Response is Stale"'
+        assert response.body["id"] == str(film_2.id)
+        assert await count_gets(elastic_client, config.ELASIC_INDEX_NAME_MOVIES) == gets
+
+
+class TestEarlyRefresh:
+    """
+    Test that a cached query about to expire, relative to how long it took, is
+    served and refreshed in the background, see the app's CachePolicy.should_refresh.
+    """
+
+    @pytest.fixture(autouse=True)
+    async def setup(self, clear_cache, populate_elastic):
+        pass
+
+    @pytest.mark.asyncio
+    async def test_refresh(self, client, elastic_client, redis_client):
+        await client.get(f"/films/{film_2.id}")
+        await elastic_client.index(
+            index=config.ELASIC_INDEX_NAME_MOVIES,
+            id=str(film_2.id),
+            document={**film_2.to_dict(), "title": "Updated"},
+            refresh="wait_for",
+        )
+        # as if the query took so long that the entry is always due a refresh
+        await update_entries(redis_client, delta=1e6)
+        await drop_responses(redis_client)
+
+        response = await client.get(f"/films/{film_2.id}")
+
+        assert response.status == 200
+        assert response.body["title"] == film_2.title
+        await asyncio.sleep(0.3)
+        await drop_responses(redis_client)
+        response = await client.get(f"/films/{film_2.id}")
+        assert response.body["title"] == "Updated"
+
+    @pytest.mark.asyncio
+    async def test_fresh(self, client, elastic_client, redis_client):
+        await client.get(f"/films/{film_2.id}")
+        await drop_responses(redis_client)
+        gets = await count_gets(elastic_client, config.ELASIC_INDEX_NAME_MOVIES)
+
+        response = await client.get(f"/films/{film_2.id}")
+
+        assert response.status == 200
+        await asyncio.sleep(0.3)
+        assert await count_gets(elastic_client, config.ELASIC_INDEX_NAME_MOVIES) == gets
+
+
+class TestDeadline:
+    """
+    Test that a request running out of the time the client gave it in the
+    X-Request-Timeout header is answered with a 504.
+    """
+
+    @pytest.fixture(autouse=True)
+    async def setup(self, clear_cache, populate_elastic):
+        pass
+
+    @pytest.mark.asyncio
+    async def test_exceeded(self, client):
+        # too short for even the cache to answer
+        response = await client.get(
+            f"/films/{film_2.id}", headers={"X-Request-Timeout": "0.0001"}
+        )
+
+        assert response.status == 504
+        assert response.body == {"detail": "request deadline exceeded"}
+
+    @pytest.mark.asyncio
+    async def test_exceeded_waiting(self, client, redis_client):
+        await client.get(f"/films/{film_2.id}")
+        [key] = await cached_keys(redis_client, config.ELASIC_INDEX_NAME_MOVIES)
+        await redis_client.flushdb()
+        # another worker is filling the key, and won't within the timeout
+        await redis_client.set(f"lock:{key}", "other", ex=5)
+
+        started_at = time.monotonic()
+        response = await client.get(
+            f"/films/{film_2.id}", headers={"X-Request-Timeout": "0.2"}
+        )
+
+        assert response.status == 504
+        assert time.monotonic() - started_at < 0.5
+
+    @pytest.mark.parametrize("timeout", ["10", "0", "-1", "soon"])
+    @pytest.mark.asyncio
+    async def test_not_exceeded(self, client, timeout: str):
+        response = await client.get(
+            f"/films/{film_2.id}", headers={"X-Request-Timeout": timeout}
+        )
+
+        assert response.status == 200
+        assert response.body["id"] == str(film_2.id)
+
+
+class TestConditionalRetrieve:
+    @pytest.fixture(autouse=True)
+    async def setup(self, clear_cache, populate_elastic):
+        pass
+
+    @pytest.mark.parametrize("test_cache", [False, True])
+    @pytest.mark.asyncio
+    async def test_not_modified(self, client, redis_client, test_cache: bool):
+        response = await client.get(f"/films/{film_2.id}")
+        etag = response.headers["ETag"]
+        if not test_cache:
+            await redis_client.flushdb()
+
+        response = await client.get(
+            f"/films/{film_2.id}", headers={"If-None-Match": etag}
+        )
+
+        assert response.status == 304
+        assert response.headers["ETag"] == etag
+
+    @pytest.mark.asyncio
+    async def test_modified(self, client):
+        etag = (await client.get(f"/films/{film_2.id}")).headers["ETag"]
+
+        response = await client.get(
+            f"/films/{film_2.id}", headers={"If-None-Match": '"other"'}
+        )
+
+        assert response.status == 200
+        assert response.headers["ETag"] == etag
+        assert response.body["id"] == str(film_2.id)
+
+
+class TestSparseFieldsets:
+    @pytest.fixture(autouse=True)
+    async def setup(self, clear_cache, populate_elastic):
+        pass
+
+    @pytest.mark.parametrize("test_cache", [False, True])
+    @pytest.mark.parametrize(
+        "params, status, body",
+        [
+            # film fields
+            (
+                {"fields[film]": "title,imdb_rating"},
+                200,
+                {"title": film_2.title, "imdb_rating": film_2.imdb_rating},
+            ),
+            # nested genre fields
+            (
+                {"fields[film]": "title,genres", "fields[genre]": "name"},
+                200,
+                {
+                    "title": film_2.title,
+                    "genres": [{"name": x.name} for x in film_2.genres],
+                },
+            ),
+            # unknown and empty fieldsets
+            ({"fields[film]": "title,rating"}, 422, None),
+            ({"fields[film]": ""}, 422, None),
+            ({"fields[genre]": "title"}, 422, None),
+        ],
+    )
+    @pytest.mark.asyncio
+    async def test_retrieve(
+        self,
+        client,
+        elastic_client,
+        params: dict,
+        status: int,
+        body: dict | None,
+        test_cache: bool,
+    ):
+        async def _request():
+            return await client.get(f"/films/{film_2.id}", params=params)
+
+        if test_cache and status == 200:
+            await _request()
+            await clear_index(elastic_client, config.ELASIC_INDEX_NAME_MOVIES)
+
+        response = await _request()
+        assert response.status == status
+        if body is not None:
+            assert response.body == body
+
+    @pytest.mark.asyncio
+    async def test_list(self, client):
+        response = await client.get("/films", params={"fields[film]": "title"})
+        assert response.status == 200
+        assert response.body["results"]
+        assert all(x.keys() == {"title"} for x in response.body["results"])
+
+
+class TestScroll:
+    films = [Film(title=f"film {i}", imdb_rating=i % 3) for i in range(7)]
+
+    @pytest.fixture(autouse=True)
+    async def setup(self, clear_cache, elastic_client):
+        await clear_and_populate_index(
+            elastic_client,
+            config.ELASIC_INDEX_NAME_MOVIES,
+            ES_MOVIES_SCHEMA,
+            self.films,
+        )
+
+    @pytest.mark.parametrize("page_size", [1, 3, 7, 10])
+    @pytest.mark.asyncio
+    async def test_scroll(self, client, page_size: int):
+        params = {"page[size]": page_size, "sort": "imdb_rating"}
+        results = []
+        while True:
+            response = await client.get("/films/scroll", params=params)
+            assert response.status == 200
+            assert len(response.body["results"]) <= page_size
+            results += response.body["results"]
+            if not response.body["next_cursor"]:
+                break
+            params["page[cursor]"] = response.body["next_cursor"]
+
+        assert [x["id"] for x in results] == [
+            str(x.id)
+            for x in sorted(self.films, key=lambda x: (x.imdb_rating, str(x.id)))
+        ]
+
+    @pytest.mark.asyncio
+    async def test_invalid_cursor(self, client):
+        response = await client.get("/films/scroll", params={"page[cursor]": "-"})
+        assert response.status == 422
@@ -1,7 +1,7 @@
 import uuid
 
 import pytest
-from conftest import clear_indexes
+from conftest import clear_indexes, expire_cache
 from data.data import genre_sci_fi, genres
 from data.models import Genre
 
@@ -60,3 +60,69 @@ class TestRetrieve:
         assert response.status == status
         if status == 200:
             assert response.body == {"id": str(result.id), "name": result.name}
+
+
+class TestBulkRetrieve:
+    @pytest.mark.parametrize("test_cache", [False, True])
+    @pytest.mark.asyncio
+    async def test_retrieve(
+        self, populate_elastic, clear_cache, client, elastic_client, test_cache: bool
+    ):
+        missing_id = uuid.uuid4()
+
+        async def _request():
+            return await client.get(
+                "/genres/", params={"ids": f"{genre_sci_fi.id},{missing_id}"}
+            )
+
+        if test_cache:
+            await _request()
+            await clear_indexes(elastic_client)
+
+        response = await _request()
+
+        assert response.status == 200
+        assert response.body == {
+            "results": [{"id": str(genre_sci_fi.id), "name": genre_sci_fi.name}, None]
+        }
+
+
+class TestCacheHeaders:
+    @pytest.mark.parametrize("test_cache", [False, True])
+    @pytest.mark.asyncio
+    async def test_list(
+        self, populate_elastic, clear_cache, client, elastic_client, test_cache: bool
+    ):
+        async def _request():
+            return await client.get("/genres")
+
+        if test_cache:
+            await _request()
+            await clear_indexes(elastic_client)
+
+        response = await _request()
+
+        assert response.status == 200
+        assert "max-age=" in response.headers["Cache-Control"]
+        assert response.headers["Surrogate-Key"].split() == [
+            "genre",
+            *(f"genre:{genre.id}" for genre in genres),
+        ]
+
+
+class TestStale:
+    @pytest.mark.asyncio
+    async def test_list(
+        self, populate_elastic, clear_cache, client, elastic_client, redis_client
+    ):
+        await client.get("/genres")
+        await expire_cache(redis_client)
+        await clear_indexes(elastic_client)
+
+        response = await client.get("/genres")
+
+        assert response.status == 200
+        assert response.headers["Warning"] == '110 - "Response is Stale"'
+        assert response.body == [
+            {"id": str(genre.id), "name": genre.name} for genre in genres
+        ]
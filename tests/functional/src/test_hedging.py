@@ -0,0 +1,99 @@
+import asyncio
+from collections import defaultdict
+from types import SimpleNamespace
+from uuid import uuid4
+
+import hedging as benchmark
+import pytest
+from aiohttp import web
+from db.hedging import HedgingElasticAdapter, hedging_stats
+from utils.base import elastic_connection
+
+
+@pytest.fixture
+async def cluster(monkeypatch):
+    """
+    The stub cluster of the hedging benchmark, with one of the two shard copies
+    pausing on every read, and reads without a preference sent to that one.
+    """
+    monkeypatch.setattr(
+        benchmark, "random", SimpleNamespace(randrange=lambda n: 0, random=lambda: 0)
+    )
+    runner = web.AppRunner(benchmark.stub_app(latency=0.005, pause=0.3, pause_rate=1))
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", benchmark.PORT).start()
+    try:
+        # with connections to spare for the hedges, as in the benchmark
+        async with elastic_connection(
+            hosts=[f"http://127.0.0.1:{benchmark.PORT}"], maxsize=100
+        ) as elastic:
+            yield elastic
+    finally:
+        await runner.cleanup()
+
+
+class TestHedgingElasticAdapter:
+    """
+    Test the app's HedgingElasticAdapter in-process, against the stub cluster of the
+    hedging benchmark, see the app's db.hedging.
+    """
+
+    @pytest.fixture
+    def adapter(self, cluster):
+        return HedgingElasticAdapter(
+            cluster, percentile=95, initial_delay=0.05, min_delay=0
+        )
+
+    @pytest.fixture
+    def attempts(self, adapter, monkeypatch) -> dict[str, list[tuple]]:
+        """
+        The attempts at reading each document, as their preference and whether they
+        were answered or cancelled.
+        """
+        attempts = defaultdict(list)
+        get = adapter.adapter.get
+
+        async def spy(index, id, fields=None, *, preference=None):
+            try:
+                result = await get(index, id, fields, preference=preference)
+            except asyncio.CancelledError:
+                attempts[str(id)].append((preference, "cancelled"))
+                raise
+            attempts[str(id)].append((preference, "answered"))
+            return result
+
+        monkeypatch.setattr(adapter.adapter, "get", spy)
+        return attempts
+
+    @pytest.mark.asyncio
+    async def test_hedge(self, adapter, attempts):
+        ids = [uuid4() for _ in range(20)]
+        stats = dict(vars(hedging_stats))
+
+        results = await asyncio.gather(*[adapter.get("movies", id) for id in ids])
+        # the losing attempts are cancelled, and see it on the loop's next iteration
+        await asyncio.sleep(0)
+
+        assert [x["id"] for x in results] == [str(x) for x in ids]
+        assert hedging_stats.queries - stats["queries"] == len(ids)
+        assert hedging_stats.hedged - stats["hedged"] == len(ids)
+        # a hedge has an even chance of going to the copy that doesn't pause
+        assert hedging_stats.hedge_wins > stats["hedge_wins"]
+        for id in ids:
+            primary, hedge = sorted(attempts[str(id)], key=lambda x: x[0] is not None)
+            assert primary[0] is None
+            assert hedge[0] is not None
+            assert sorted([primary[1], hedge[1]]) == ["answered", "cancelled"]
+
+    @pytest.mark.asyncio
+    async def test_no_hedge(self, adapter, attempts, monkeypatch):
+        # reads without a preference go to the copy that doesn't pause
+        monkeypatch.setattr(benchmark.random, "randrange", lambda n: 1)
+        id = uuid4()
+        hedged = hedging_stats.hedged
+
+        result = await adapter.get("movies", id)
+
+        assert result["id"] == str(id)
+        assert hedging_stats.hedged == hedged
+        assert attempts[str(id)] == [(None, "answered")]
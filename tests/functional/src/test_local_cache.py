@@ -0,0 +1,159 @@
+import asyncio
+
+import db.cache
+import pytest
+from config import config
+from data.data import film_2
+from db.cache import LocalCache, LocalCacheAdapter, RedisAdapter, get_cache
+from db.codecs import CacheCodec, OrjsonSerializer
+from db.elastic import CachedElasticDecorator, CachePolicy, ElasticAdapter
+from db.generations import IndexGenerations
+from db.keys import CacheKeyBuilder
+from utils.base import redis_connection
+
+
+@pytest.fixture
+async def redis(clear_cache):
+    async with redis_connection(url=config.REDIS_PATH) as redis:
+        yield redis
+
+
+@pytest.fixture
+def local():
+    return LocalCache(max_entries=3, max_bytes=300, ttl=10)
+
+
+@pytest.fixture
+def cache(redis, local):
+    return LocalCacheAdapter(local, RedisAdapter(redis, CacheCodec(OrjsonSerializer())))
+
+
+class TestLocalCacheAdapter:
+    """
+    Test the app's in-process cache in front of Redis, see the app's db.cache.
+    """
+
+    @pytest.mark.asyncio
+    async def test_get_cache(self, redis, local, monkeypatch):
+        monkeypatch.setattr(db.cache, "redis_client", redis)
+        monkeypatch.setattr(db.cache, "local_cache", None)
+        assert isinstance(await get_cache(), RedisAdapter)
+
+        monkeypatch.setattr(db.cache, "local_cache", local)
+        cache = await get_cache()
+
+        assert isinstance(cache, LocalCacheAdapter)
+        assert cache.local is local
+
+    @pytest.mark.asyncio
+    async def test_set(self, cache, local, redis):
+        await cache.set("key", {"value": 1}, ttl=10)
+        await redis.flushdb()
+
+        assert await cache.get("key") == {"value": 1}
+        assert len(local) == 1
+
+    @pytest.mark.asyncio
+    async def test_get(self, cache, local, redis):
+        await cache.cache.set("key", {"value": 1}, ttl=10)
+        assert len(local) == 0
+
+        assert await cache.get("key") == {"value": 1}
+        await redis.flushdb()
+
+        assert await cache.get("key") == {"value": 1}
+
+    @pytest.mark.asyncio
+    async def test_get_many(self, cache, local, redis):
+        await cache.cache.set_many([("a", 1, 10), ("b", 2, 10)])
+
+        assert await cache.get_many(["a", "b", "c"]) == [1, 2, None]
+        await redis.flushdb()
+
+        assert await cache.get_many(["a", "b", "c"]) == [1, 2, None]
+        assert len(local) == 2
+
+    @pytest.mark.parametrize("fill", ["set", "get"])
+    @pytest.mark.asyncio
+    async def test_expire_with_redis(self, cache, local, fill: str):
+        # the local TTL is longer than the key's
+        if fill == "set":
+            await cache.set("key", {"value": 1}, ttl=1)
+        else:
+            await cache.cache.set("key", {"value": 1}, ttl=1)
+            await cache.get("key")
+        assert len(local) == 1
+
+        await asyncio.sleep(1.1)
+
+        assert local.get("key") is None
+        assert await cache.get("key") is None
+
+    @pytest.mark.asyncio
+    async def test_evict_least_recently_used(self, cache, local):
+        for key in ["a", "b", "c"]:
+            await cache.set(key, key, ttl=10)
+        await cache.get("a")
+
+        await cache.set("d", "d", ttl=10)
+
+        assert len(local) == 3
+        assert [local.get(x) for x in ["a", "b", "c", "d"]] == ["a", None, "c", "d"]
+
+    @pytest.mark.asyncio
+    async def test_evict_by_size(self, cache, local):
+        # each takes over a third of the local cache's bytes
+        for key in ["a", "b", "c"]:
+            await cache.set(key, key * 120, ttl=10)
+
+        assert local.bytes <= local.max_bytes
+        assert [local.get(x) for x in ["a", "b", "c"]] == [None, "b" * 120, "c" * 120]
+
+    @pytest.mark.asyncio
+    async def test_too_large(self, cache, local):
+        await cache.set("key", "x" * 400, ttl=10)
+
+        assert len(local) == 0
+        assert local.bytes == 0
+        assert await cache.get("key") == "x" * 400
+
+
+class TestGenerations:
+    """
+    Test that bumping an index's generation invalidates its documents cached in
+    process too, their keys embedding the generation.
+    """
+
+    @pytest.fixture(autouse=True)
+    async def setup(self, populate_elastic):
+        pass
+
+    @pytest.mark.asyncio
+    async def test_bump(self, redis, elastic_client):
+        generations = IndexGenerations(redis, "test", ttl=10)
+        elastic = CachedElasticDecorator(
+            ElasticAdapter(elastic_client),
+            LocalCacheAdapter(
+                LocalCache(max_entries=100, max_bytes=1024 * 1024, ttl=10),
+                RedisAdapter(redis, CacheCodec(OrjsonSerializer())),
+            ),
+            CachePolicy(ttl=60),
+            CacheKeyBuilder("test"),
+            generations,
+        )
+        await elastic.get(config.ELASIC_INDEX_NAME_MOVIES, film_2.id)
+        await elastic_client.index(
+            index=config.ELASIC_INDEX_NAME_MOVIES,
+            id=str(film_2.id),
+            document={**film_2.to_dict(), "title": "Updated"},
+            refresh="wait_for",
+        )
+        await redis.flushdb()
+        # served from the process
+        doc = await elastic.get(config.ELASIC_INDEX_NAME_MOVIES, film_2.id)
+        assert doc["title"] == film_2.title
+
+        await generations.bump(config.ELASIC_INDEX_NAME_MOVIES)
+
+        doc = await elastic.get(config.ELASIC_INDEX_NAME_MOVIES, film_2.id)
+        assert doc["title"] == "Updated"
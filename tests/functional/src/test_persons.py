@@ -2,10 +2,10 @@ import uuid
 
 import pytest
 from config import config
-from conftest import clear_and_populate_index, clear_indexes
+from conftest import clear_and_populate_index, clear_index, clear_indexes
 from data.data import film_1, film_2, film_3, person_lucas
-from data.indexes import ES_PERSONS_SCHEMA
-from data.models import Person
+from data.indexes import ES_MOVIES_SCHEMA, ES_PERSONS_SCHEMA
+from data.models import Film, FilmShort, Person
 
 
 class TestSearch:
@@ -147,6 +147,47 @@ class TestRetrieve:
         assert response.status == 404
 
 
+class TestBulkRetrieve:
+    @pytest.mark.parametrize("test_cache", [False, True])
+    @pytest.mark.asyncio
+    async def test_retrieve(
+        self, populate_elastic, clear_cache, client, elastic_client, test_cache: bool
+    ):
+        missing_id = uuid.uuid4()
+
+        async def _request():
+            return await client.get(
+                "/persons/", params={"ids": f"{missing_id},{person_lucas.id}"}
+            )
+
+        if test_cache:
+            await _request()
+            await clear_indexes(elastic_client)
+
+        response = await _request()
+
+        assert response.status == 200
+        assert response.body == {
+            "results": [
+                None,
+                {
+                    "id": str(person_lucas.id),
+                    "name": person_lucas.full_name,
+                    "actor": [str(x.id) for x in person_lucas.actor],
+                    "writer": [str(x.id) for x in person_lucas.writer],
+                    "director": [str(x.id) for x in person_lucas.director],
+                },
+            ]
+        }
+
+    @pytest.mark.parametrize("ids", ["", "not-an-id"])
+    @pytest.mark.asyncio
+    async def test_invalid_ids(self, client, ids: str):
+        response = await client.get("/persons/", params={"ids": ids})
+
+        assert response.status == 422
+
+
 class TestListPersonsFilms:
     @pytest.mark.parametrize("test_cache", [False, True])
     @pytest.mark.asyncio
@@ -178,6 +219,65 @@ class TestListPersonsFilms:
             ],
         }
 
+    @pytest.mark.asyncio
+    async def test_list_films_from_person(
+        self, populate_elastic, clear_cache, client, elastic_client
+    ):
+        await clear_index(elastic_client, config.ELASIC_INDEX_NAME_MOVIES)
+
+        response = await client.get(f"/persons/{person_lucas.id}/films")
+
+        assert response.status == 200
+        assert [x["id"] for x in response.body["actor"]] == [str(film_3.id)]
+        assert [x["title"] for x in response.body["writer"]] == [
+            film_1.title,
+            film_2.title,
+        ]
+
+    @pytest.mark.parametrize(
+        "source, title, imdb_rating",
+        [
+            ("person", "Embedded Title", 5.0),
+            ("movies", "Indexed Title", 7.5),
+        ],
+    )
+    @pytest.mark.asyncio
+    async def test_list_films_source(
+        self,
+        populate_elastic,
+        clear_cache,
+        client,
+        elastic_client,
+        source: str,
+        title: str,
+        imdb_rating: float,
+    ):
+        film = Film(title="Indexed Title", imdb_rating=7.5)
+        person = Person(
+            full_name="Mark Hamill",
+            actor=[FilmShort(id=film.id, title="Embedded Title", imdb_rating=5.0)],
+        )
+        await clear_and_populate_index(
+            elastic_client, config.ELASIC_INDEX_NAME_MOVIES, ES_MOVIES_SCHEMA, [film]
+        )
+        await clear_and_populate_index(
+            elastic_client,
+            config.ELASIC_INDEX_NAME_PERSONS,
+            ES_PERSONS_SCHEMA,
+            [person],
+        )
+
+        response = await client.get(
+            f"/persons/{person.id}/films", params={"source": source}
+        )
+
+        assert response.status == 200
+        assert response.body == {
+            "actor": [{"id": str(film.id), "title": title, "imdb_rating": imdb_rating}],
+            "writer": [],
+            "director": [],
+        }
+
     @pytest.mark.parametrize("test_cache", [False, True])
     @pytest.mark.asyncio
     async def test_list_films_not_found(